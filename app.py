@@ -1,20 +1,42 @@
 from __future__ import annotations
 
+import asyncio
+import codecs
+import hashlib
+import json
+import os
 import re
+import threading
 import time
-from datetime import datetime, timedelta
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
 from io import BytesIO
-from typing import Iterable
+from itertools import islice
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Iterator, TypeVar
+from urllib.parse import quote
 
 import FinanceDataReader as fdr
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
 import yfinance as yf
 from plotly.subplots import make_subplots
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-
-st.set_page_config(page_title="경제 대시보드 + VCP 차트", layout="wide")
+try:
+    import fcntl
+except ImportError:
+    # Windows에는 flock이 없어 프로세스 사이 조율 없이 각자 받는다.
+    fcntl = None
 
 
 MARKET_TICKERS = [
@@ -30,6 +52,66 @@ MARKET_TICKERS = [
     {"name": "VIX", "symbol": "^VIX", "provider": "yf"},
 ]
 
+# 차트는 봉 하나에 최소 이 정도 픽셀을 주고, 넘치면 오래된 구간을 주봉/월봉으로 묶는다.
+CHART_MIN_BAR_WIDTH_PX = 1.5
+CHART_FULL_RESOLUTION_BARS = 65
+CHART_PIVOT_BAND = 0.02
+LINE_CHART_POINTS_PER_PX = 2
+# 거래량 막대 색. 간단 전송 모드에서는 색 문자열 대신 0/1 배열과 이 색 척도로 보낸다.
+VOLUME_COLORSCALE = [[0, "#ef553b"], [1, "#2f9e73"]]
+_DECIMATION_STEPS = [("W-FRI", "주봉"), ("M", "월봉"), ("Q", "분기봉")]
+BAR_TIMEFRAMES = {"일봉": "daily", "주봉": "weekly", "월봉": "monthly"}
+
+FIGURE_CACHE_MAX_ENTRIES = 128
+# 화면에 보이는 페이지의 종목만 불러오고 차트를 만든다.
+VCP_CHARTS_PER_PAGE = 6
+WATCHLIST_CHARTS_PER_PAGE = 6
+
+DEFAULT_HISTORY_DAYS = 365
+PREFETCH_MAX_WORKERS = 8
+PREFETCH_TIMEOUT_SECONDS = 45
+PROVIDER_CONCURRENCY = {"fdr": 4, "yf": 3}
+# (초당 요청 수, 한 번에 몰아 쓸 수 있는 요청 수)
+PROVIDER_RATE_LIMITS = {"fdr": (4.0, 8), "yf": (2.0, 4)}
+DATA_PROGRESS_INTERVAL_SECONDS = 0.25
+
+PROVIDER_LABELS = {"fdr": "FinanceDataReader", "yf": "yfinance"}
+NEGATIVE_CACHE_TTL_SECONDS = 60 * 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 60 * 2
+# 묶음 요청의 모든 종목이 비어 돌아와도 구간이 이보다 짧으면(주말, 연휴) 실패로 보지 않는다.
+BREAKER_EMPTY_BATCH_BUSINESS_DAYS = 5
+
+CACHE_DIR = Path(os.environ.get("DASHBOARD_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
+TICKER_RESOLUTION_PATH = CACHE_DIR / "ticker_resolution.json"
+KRX_LISTING_PATH = CACHE_DIR / "krx_listing.parquet"
+KRX_LISTING_MAX_AGE_SECONDS = 60 * 60 * 24
+PRICE_STORE_DIR = Path(os.environ.get("PRICE_STORE_DIR", CACHE_DIR / "ohlcv"))
+PRICE_STORE_REFRESH_SECONDS = 60 * 30
+# 저장된 데이터가 있으면 갱신 주기가 지났어도 바로 보여 주고, 마지막 봉 이후만 백그라운드에서 다시 받는다.
+STALE_WHILE_REVALIDATE = True
+# 마지막으로 받은 뒤 이 거래일 수보다 오래 비어 있으면 저장된 데이터를 먼저 보여 주지 않고 받을 때까지 기다린다.
+STALE_MAX_BUSINESS_DAYS = 1
+PRICE_REFRESH_WORKERS = 2
+# 메모리에 올려 둘 가격 데이터의 최대 크기. 넘으면 가장 오래 쓰지 않은 종목부터 내린다(디스크에는 남는다).
+PRICE_MEMORY_BUDGET_BYTES = int(float(os.environ.get("PRICE_MEMORY_BUDGET_MB", 256)) * 2**20)
+# 주요 지표 실시간 갱신 주기. 이 간격마다 마지막 봉부터만 다시 받는다.
+MARKET_LIVE_INTERVALS = {"30초": 30, "1분": 60, "5분": 300}
+# 저장된 첫 봉이 커버리지 시작보다 이만큼 늦으면 상장 이전 구간으로 보고 다시 요청하지 않는다.
+PRICE_STORE_LISTING_GAP = timedelta(days=14)
+# 여러 종목의 빈 구간을 한 번에 받을 때 양 끝이 이 정도 안쪽으로 맞는 구간만 묶는다.
+PRICE_BATCH_SLACK = timedelta(days=7)
+# 같은 저장소를 쓰는 여러 프로세스 중 한 곳만 같은 종목을 받도록 임대 파일에 flock을 건다. 다른 프로세스가 받는
+# 중이면 한 번의 요청에서 최대 이 시간까지만 기다리고, 그래도 안 끝나면 저장된 데이터를 그대로 보여 준다.
+SHARED_LEASE_WAIT_SECONDS = 20
+SHARED_LEASE_POLL_SECONDS = 0.2
+
+# 단계별로 최근 이만큼의 소요 시간만 남겨 백분위를 계산한다.
+METRICS_SAMPLE_SIZE = 512
+# 설정하면 이 폴더에 metrics.json과 Prometheus 텍스트 형식의 metrics.prom을 주기적으로 쓴다.
+METRICS_EXPORT_DIR = Path(os.environ["DASHBOARD_METRICS_DIR"]) if os.environ.get("DASHBOARD_METRICS_DIR") else None
+METRICS_EXPORT_INTERVAL_SECONDS = 30
+
 REQUIRED_VCP_COLUMNS = {
     "ticker",
     "name",
@@ -38,6 +120,60 @@ REQUIRED_VCP_COLUMNS = {
     "pivot_price",
     "pivot_distance_pct",
 }
+# VCP 탭이 실제로 쓰는 컬럼만 읽는다. 문자열 컬럼은 종목코드 앞자리 0이 사라지지 않도록 str로 고정한다.
+VCP_CSV_TEXT_COLUMNS = [
+    "ticker",
+    "name",
+    "vcp_phase",
+    "vcp_phase_label",
+    "pivot_timing_label",
+    "reasons",
+    "vcp_watch_point",
+]
+VCP_CSV_NUMERIC_COLUMNS = ["score", "stockeasy_rs", "rs_1m", "rs_3m", "rs_6m", "pivot_price", "pivot_distance_pct"]
+VCP_CSV_COLUMNS = frozenset(VCP_CSV_TEXT_COLUMNS + VCP_CSV_NUMERIC_COLUMNS)
+CSV_ENCODING_SNIFF_BYTES = 64 * 1024
+CSV_CACHE_MAX_ENTRIES = 4
+VCP_INDEXED_COLUMNS = ["score", "stockeasy_rs", "rs_1m", "rs_3m", "rs_6m", "pivot_distance_pct"]
+VCP_RANGE_FILTERS = {"stockeasy_rs": "RS", "pivot_distance_pct": "피벗까지 거리(%)"}
+
+# 직접 계산하는 VCP 스캐너. 200일선 기울기와 52주 고가·저가를 구할 만큼의 봉을 받는다.
+VCP_SCAN_HISTORY_DAYS = 400
+VCP_SCAN_BARS = 260
+VCP_SCAN_MIN_BARS = 220
+# 최근 VCP_RECENT_BARS개 봉을 뺀 그 앞 구간을 같은 길이로 나눠 수축 폭을 비교한다.
+VCP_BASE_SEGMENTS = 4
+VCP_SEGMENT_BARS = 15
+VCP_RECENT_BARS = 5
+VCP_DRY_UP_RATIO = 0.75
+VCP_BREAKOUT_VOLUME_RATIO = 1.5
+VCP_PIVOT_NEAR_PCT = 5.0
+VCP_RS_WEIGHTS = {63: 0.4, 126: 0.2, 189: 0.2, 252: 0.2}
+VCP_SCAN_CHUNK = 512
+VCP_SCAN_WORKERS = os.cpu_count() or 1
+VCP_SCAN_TIMEOUT_SECONDS = 60 * 15
+VCP_PHASE_LABELS = {
+    "1.0": "추세 미충족",
+    "1.5": "베이스 미형성",
+    "2.1": "수축 진행",
+    "2.2": "수축 + 거래량 감소",
+    "2.3": "피벗 임박",
+    "3.0": "피벗 돌파",
+}
+VCP_SCAN_COLUMNS = [
+    "ticker",
+    "vcp_phase",
+    "vcp_phase_label",
+    "pivot_price",
+    "pivot_distance_pct",
+    "score",
+    "stockeasy_rs",
+    "rs_1m",
+    "rs_3m",
+    "rs_6m",
+    "reasons",
+]
+VCP_SOURCES = ["CSV 업로드", "KRX 전 종목 계산"]
 
 
 def to_float(value, default: float | None = None) -> float | None:
@@ -67,11 +203,96 @@ def _flatten_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def normalize_price_frame(df: pd.DataFrame) -> pd.DataFrame:
+PRICE_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+
+
+@dataclass(frozen=True, eq=False)
+class PriceSeries:
+    # 일봉을 열 단위 배열로 들고 다닌다. 날짜는 datetime64[ns], OHLC는 float32, 거래량은 int64이며 읽기 전용이다.
+    date: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    is_sorted: bool = True
+
+    def __post_init__(self):
+        for name in PRICE_COLUMNS:
+            getattr(self, name).flags.writeable = False
+
+    @classmethod
+    def from_columns(cls, date, open, high, low, close, volume, is_sorted: bool = False) -> PriceSeries:
+        dates = np.asarray(date, dtype="datetime64[ns]")
+        columns = {
+            "open": np.asarray(open, dtype=np.float32),
+            "high": np.asarray(high, dtype=np.float32),
+            "low": np.asarray(low, dtype=np.float32),
+            "close": np.asarray(close, dtype=np.float32),
+            "volume": np.nan_to_num(np.asarray(volume, dtype=np.float64)).astype(np.int64),
+        }
+        if not is_sorted and len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind="stable")
+            dates = dates[order]
+            columns = {name: values[order] for name, values in columns.items()}
+        return cls(date=dates, **columns)
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.date) == 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in PRICE_COLUMNS)
+
+    def take(self, positions) -> PriceSeries:
+        return PriceSeries(**{name: getattr(self, name)[positions] for name in PRICE_COLUMNS})
+
+    def slice_dates(self, start: datetime, end: datetime) -> PriceSeries:
+        lo = self.date.searchsorted(np.datetime64(pd.Timestamp(start), "ns"), side="left")
+        hi = self.date.searchsorted(np.datetime64(pd.Timestamp(end), "ns"), side="left")
+        if lo == 0 and hi == len(self):
+            return self
+        return self.take(slice(lo, hi))
+
+    def merge(self, update: PriceSeries) -> PriceSeries:
+        if self.empty:
+            return update
+        if update.empty:
+            return self
+        # 같은 날짜는 새로 받은 봉을 쓴다.
+        keep = ~np.isin(self.date, update.date)
+        return PriceSeries.from_columns(
+            **{name: np.concatenate([getattr(self, name)[keep], getattr(update, name)]) for name in PRICE_COLUMNS},
+            is_sorted=bool(keep.all()) and self.date[-1] < update.date[0],
+        )
+
+    @classmethod
+    def concat(cls, parts: list[PriceSeries]) -> PriceSeries:
+        return cls(**{name: np.concatenate([getattr(part, name) for part in parts]) for name in PRICE_COLUMNS})
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: getattr(self, name) for name in PRICE_COLUMNS})
+
+
+EMPTY_PRICES = PriceSeries.from_columns(*([()] * len(PRICE_COLUMNS)))
+
+
+def normalize_price_frame(df: pd.DataFrame | PriceSeries | None) -> PriceSeries:
     if df is None or df.empty:
-        return pd.DataFrame()
+        return EMPTY_PRICES
+    # 재실행마다 클래스가 새로 정의되어 캐시에 남은 PriceSeries는 isinstance로 가려낼 수 없다.
+    if not isinstance(df, pd.DataFrame):
+        return df if df.is_sorted else PriceSeries.from_columns(**{name: getattr(df, name) for name in PRICE_COLUMNS})
+    with timed_stage("normalize"):
+        return _price_series_from_frame(df)
 
-    frame = _flatten_columns(df).copy()
+
+def _price_series_from_frame(df: pd.DataFrame) -> PriceSeries:
+    frame = _flatten_columns(df)
     frame = frame.rename(columns={str(col): str(col).lower() for col in frame.columns})
 
     if "date" not in frame.columns:
@@ -82,57 +303,163 @@ def normalize_price_frame(df: pd.DataFrame) -> pd.DataFrame:
 
     required = ["date", "open", "high", "low", "close"]
     if not set(required).issubset(frame.columns):
-        return pd.DataFrame()
+        return EMPTY_PRICES
 
-    frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
+    dates = pd.to_datetime(frame["date"], errors="coerce")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    columns = {"date": dates}
     for col in ["open", "high", "low", "close", "volume"]:
         if col in frame.columns:
-            frame[col] = pd.to_numeric(frame[col], errors="coerce")
-
-    if "volume" not in frame.columns:
-        frame["volume"] = 0
+            columns[col] = pd.to_numeric(frame[col], errors="coerce")
 
-    frame = frame.dropna(subset=["date", "open", "high", "low", "close"])
-    frame = frame.sort_values("date")
-    return frame[["date", "open", "high", "low", "close", "volume"]].reset_index(drop=True)
+    valid = np.logical_and.reduce([columns[col].notna().to_numpy() for col in required])
+    arrays = {col: values.to_numpy()[valid] for col, values in columns.items()}
+    arrays.setdefault("volume", np.zeros(int(valid.sum())))
+    return PriceSeries.from_columns(**arrays)
 
 
-def _trading_day_xaxis(frame: pd.DataFrame) -> dict[str, object]:
+def _trading_day_xaxis(date_labels: np.ndarray) -> dict[str, object]:
     return {
         "type": "category",
         "categoryorder": "array",
-        "categoryarray": frame["date_label"].tolist(),
+        "categoryarray": date_labels.tolist(),
     }
 
 
-def _volume_colors(frame: pd.DataFrame) -> list[str]:
-    return [
-        "#2f9e73" if close >= open_ else "#ef553b"
-        for open_, close in zip(frame["open"], frame["close"])
-    ]
+def _volume_colors(prices: PriceSeries) -> np.ndarray:
+    return np.where(prices.close >= prices.open, "#2f9e73", "#ef553b")
 
 
-def resample_weekly(prices: pd.DataFrame) -> pd.DataFrame:
-    if prices.empty:
-        return pd.DataFrame()
+def _volume_marker(prices: PriceSeries, compact: bool) -> dict[str, object]:
+    if not compact:
+        return {"color": _volume_colors(prices)}
+    rising = (prices.close >= prices.open).astype(np.int8)
+    return {"color": rising, "colorscale": VOLUME_COLORSCALE, "cmin": 0, "cmax": 1}
+
+
+def _period_keys(dates: np.ndarray, freq: str) -> np.ndarray:
+    if freq == "W-FRI":
+        # 1970-01-03(토)부터 7일씩 묶으면 금요일로 끝나는 주가 된다.
+        return (dates.astype("datetime64[D]").astype(np.int64) - 2) // 7
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    return months if freq == "M" else months // 3
 
-    frame = prices.copy()
-    frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
-    frame = frame.dropna(subset=["date"]).sort_values("date")
-    if frame.empty:
-        return pd.DataFrame()
 
-    return (
-        frame.set_index("date")
-        .resample("W-FRI")
-        .agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
-        .dropna(subset=["open", "high", "low", "close"])
-        .reset_index()
+def aggregate_bars(prices: PriceSeries, keys: np.ndarray) -> tuple[PriceSeries, np.ndarray]:
+    if prices.empty:
+        return prices, np.empty(0, dtype=np.intp)
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    bars = PriceSeries(
+        date=prices.date[ends],
+        open=prices.open[starts],
+        high=np.maximum.reduceat(prices.high, starts),
+        low=np.minimum.reduceat(prices.low, starts),
+        close=prices.close[ends],
+        volume=np.add.reduceat(prices.volume, starts),
     )
+    return bars, ends
+
+
+def resample_bars(prices: PriceSeries, freq: str) -> PriceSeries:
+    # 묶음의 날짜는 그 안의 마지막 거래일이라 일봉과 같은 방식으로 기간을 자를 수 있다.
+    prices = normalize_price_frame(prices)
+    return aggregate_bars(prices, _period_keys(prices.date, freq))[0]
+
+
+def resample_weekly(prices: PriceSeries) -> PriceSeries:
+    return resample_bars(prices, "W-FRI")
+
+
+def _extend_bars(bars: PriceSeries, daily: PriceSeries, freq: str, changed_from: np.datetime64) -> PriceSeries:
+    if bars.empty:
+        return resample_bars(daily, freq)
+
+    # 바뀐 첫 일봉이 속한 묶음부터만 다시 만들고 그 앞의 묶음은 그대로 쓴다.
+    changed_key = _period_keys(np.array([changed_from], dtype="datetime64[ns]"), freq)[0]
+    kept = int(_period_keys(bars.date, freq).searchsorted(changed_key))
+    if kept == 0:
+        return resample_bars(daily, freq)
+    tail_start = daily.date.searchsorted(bars.date[kept - 1], side="right")
+    tail = resample_bars(daily.take(slice(tail_start, None)), freq)
+    return PriceSeries.concat([bars.take(slice(0, kept)), tail])
+
+
+@dataclass(frozen=True, eq=False)
+class BarPyramid:
+    daily: PriceSeries
+    weekly: PriceSeries
+    monthly: PriceSeries
+
+    @classmethod
+    def build(cls, daily: PriceSeries) -> BarPyramid:
+        return cls(daily, resample_bars(daily, "W-FRI"), resample_bars(daily, "M"))
+
+    def extend(self, daily: PriceSeries, changed_from: np.datetime64) -> BarPyramid:
+        return BarPyramid(
+            daily,
+            _extend_bars(self.weekly, daily, "W-FRI", changed_from),
+            _extend_bars(self.monthly, daily, "M", changed_from),
+        )
+
+    def bars(self, timeframe: str) -> PriceSeries:
+        return getattr(self, BAR_TIMEFRAMES[timeframe])
+
+    @property
+    def nbytes(self) -> int:
+        return self.daily.nbytes + self.weekly.nbytes + self.monthly.nbytes
+
+
+def chart_bar_budget(target_width_px: int | None) -> int | None:
+    if not target_width_px:
+        return None
+    return max(CHART_FULL_RESOLUTION_BARS * 2, int(target_width_px / CHART_MIN_BAR_WIDTH_PX))
+
+
+def decimate_ohlc(
+    prices: PriceSeries, max_bars: int | None, pivot_price: float | None = None
+) -> tuple[PriceSeries, np.ndarray | None, str | None]:
+    if max_bars is None or len(prices) <= max_bars:
+        return prices, None, None
+
+    recent_start = max(0, len(prices) - CHART_FULL_RESOLUTION_BARS)
+    if pivot_price is not None and pd.notna(pivot_price):
+        touched = np.flatnonzero(prices.high >= float(pivot_price) * (1 - CHART_PIVOT_BAND))
+        if touched.size:
+            recent_start = min(recent_start, max(int(touched[-1]), len(prices) - max_bars // 2))
+
+    history = prices.take(slice(0, recent_start))
+    for freq, label in _DECIMATION_STEPS:
+        keys = _period_keys(history.date, freq)
+        if np.count_nonzero(np.diff(keys)) + 1 + len(prices) - recent_start <= max_bars:
+            break
+
+    # 각 묶음의 마지막 일봉 위치를 함께 돌려줘 일봉 기준 이동평균을 같은 지점에서 읽는다.
+    aggregated, positions = aggregate_bars(history, keys)
+    positions = np.r_[positions, np.arange(recent_start, len(prices))]
+    combined = PriceSeries.concat([aggregated, prices.take(slice(recent_start, None))])
+    return combined, positions, label
+
+
+def downsample_min_max(prices: PriceSeries, max_points: int | None) -> PriceSeries:
+    if max_points is None or len(prices) <= max_points:
+        return prices
+
+    values = prices.close
+    buckets = max(1, max_points // 2)
+    bucket_ids = np.arange(len(values) - 1) * buckets // (len(values) - 1)
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    # 구간 안에서 값 순으로 정렬하면 구간의 첫/끝 위치가 곧 최솟값/최댓값이다.
+    order = np.lexsort((values[:-1], bucket_ids))
+    ends = np.r_[starts[1:], len(bucket_ids)] - 1
+    keep = np.union1d(order[starts], order[ends])
+    return prices.take(np.append(keep, len(values) - 1))
 
 
 def make_price_volume_chart(
-    prices: pd.DataFrame,
+    prices: PriceSeries | pd.DataFrame,
     title: str,
     volume_title: str = "Volume",
     moving_average_windows: tuple[int, ...] = (20, 50),
@@ -140,6 +467,8 @@ def make_price_volume_chart(
     pivot_distance_pct: float | None = None,
     vcp_phase_label: str | None = None,
     chart_height: int = 760,
+    target_width_px: int | None = 720,
+    compact: bool = True,
 ) -> go.Figure:
     fig = make_subplots(
         rows=2,
@@ -150,46 +479,52 @@ def make_price_volume_chart(
         subplot_titles=(title, volume_title),
     )
 
-    required_columns = {"date", "open", "high", "low", "close", "volume"}
-    if prices.empty or not required_columns.issubset(prices.columns):
+    prices = normalize_price_frame(prices)
+    if prices.empty:
         fig.update_layout(title=f"{title} - 가격/거래량 데이터를 불러오지 못했습니다.")
         return fig
 
-    frame = prices.copy()
-    frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
-    frame = frame.dropna(subset=["date"]).sort_values("date")
-    frame["date_label"] = frame["date"].dt.strftime("%Y-%m-%d")
-    if frame.empty:
-        fig.update_layout(title=f"{title} - 가격/거래량 데이터를 불러오지 못했습니다.")
-        return fig
+    daily_close = pd.Series(prices.close, dtype=np.float64)
+    moving_averages = {
+        window: daily_close.rolling(window).mean().to_numpy()
+        for window in moving_average_windows
+        if len(daily_close) >= window
+    }
+    prices, positions, decimated_label = decimate_ohlc(prices, chart_bar_budget(target_width_px), pivot_price)
+    date_labels = np.datetime_as_string(prices.date, unit="D")
+    if decimated_label:
+        fig.layout.annotations[0].text = f"{title} (이전 구간 {decimated_label})"
+
+    # 간단 전송 모드에서는 날짜 문자열을 x축 categoryarray에만 싣는다. x를 생략한 trace는 x0부터 dx씩 놓이고,
+    # 캔들스틱은 0번 카테고리부터 놓인다. 숫자 배열은 Plotly가 base64 typed array로 보낸다.
+    trace_x = {"x0": date_labels[0], "dx": 1} if compact else {"x": date_labels}
+    value_dtype = np.float32 if compact else np.float64
 
     fig.add_trace(
         go.Candlestick(
-            x=frame["date_label"],
-            open=frame["open"],
-            high=frame["high"],
-            low=frame["low"],
-            close=frame["close"],
+            x=None if compact else date_labels,
+            open=prices.open,
+            high=prices.high,
+            low=prices.low,
+            close=prices.close,
             name=title,
         ),
         row=1,
         col=1,
     )
 
-    close = frame["close"]
-    for window in moving_average_windows:
-        if len(close) >= window:
-            fig.add_trace(
-                go.Scatter(
-                    x=frame["date_label"],
-                    y=close.rolling(window).mean(),
-                    mode="lines",
-                    name=f"MA{window}",
-                    line={"width": 1.2},
-                ),
-                row=1,
-                col=1,
-            )
+    for window, moving_average in moving_averages.items():
+        fig.add_trace(
+            go.Scatter(
+                **trace_x,
+                y=(moving_average if positions is None else moving_average[positions]).astype(value_dtype),
+                mode="lines",
+                name=f"MA{window}",
+                line={"width": 1.2},
+            ),
+            row=1,
+            col=1,
+        )
 
     if pivot_price is not None and pd.notna(pivot_price):
         distance_text = ""
@@ -209,8 +544,8 @@ def make_price_volume_chart(
 
         fig.add_trace(
             go.Scatter(
-                x=[frame["date_label"].iloc[-1]],
-                y=[float(close.iloc[-1])],
+                x=[date_labels[-1]],
+                y=[float(prices.close[-1])],
                 mode="markers+text",
                 marker={"size": 9, "color": "#222222"},
                 text=["현재가"],
@@ -221,12 +556,11 @@ def make_price_volume_chart(
             col=1,
         )
 
-    volume = pd.to_numeric(frame["volume"], errors="coerce").fillna(0)
     fig.add_trace(
         go.Bar(
-            x=frame["date_label"],
-            y=volume,
-            marker_color=_volume_colors(frame),
+            **trace_x,
+            y=prices.volume,
+            marker=_volume_marker(prices, compact),
             name="Volume",
             showlegend=False,
         ),
@@ -234,8 +568,10 @@ def make_price_volume_chart(
         col=1,
     )
 
-    shared_xaxis = _trading_day_xaxis(frame)
-    fig.update_xaxes(**shared_xaxis, rangeslider_visible=False, row=1, col=1)
+    shared_xaxis = _trading_day_xaxis(date_labels)
+    # 위 축은 make_subplots가 아래 축과 matches로 묶어 두어 카테고리 목록을 함께 쓰므로 날짜는 아래 축에만 싣는다.
+    price_xaxis = {"type": "category"} if compact else shared_xaxis
+    fig.update_xaxes(**price_xaxis, rangeslider_visible=False, row=1, col=1)
     fig.update_xaxes(**shared_xaxis, row=2, col=1)
     fig.update_layout(
         height=chart_height,
@@ -253,14 +589,20 @@ def make_price_volume_chart(
     return fig
 
 
-def make_line_chart(df: pd.DataFrame, title: str, color: str = "royalblue") -> go.Figure:
-    frame = normalize_price_frame(df)
-    if frame.empty:
+def make_line_chart(
+    prices: PriceSeries | pd.DataFrame,
+    title: str,
+    color: str = "royalblue",
+    target_width_px: int | None = 480,
+    compact: bool = True,
+) -> go.Figure:
+    prices = normalize_price_frame(prices)
+    if prices.empty:
         return go.Figure()
 
-    last_price = to_float(frame["close"].iloc[-1])
-    y_min = to_float(frame["close"].min())
-    y_max = to_float(frame["close"].max())
+    last_price = to_float(prices.close[-1])
+    y_min = to_float(prices.close.min())
+    y_max = to_float(prices.close.max())
     if last_price is None or y_min is None or y_max is None:
         return go.Figure()
 
@@ -268,11 +610,15 @@ def make_line_chart(df: pd.DataFrame, title: str, color: str = "royalblue") -> g
     if padding == 0:
         padding = 1
 
+    max_points = LINE_CHART_POINTS_PER_PX * target_width_px if target_width_px else None
+    prices = downsample_min_max(prices, max_points)
+
     fig = go.Figure()
     fig.add_trace(
         go.Scatter(
-            x=frame["date"],
-            y=frame["close"],
+            # 날짜 축은 epoch 밀리초 숫자도 받으므로 ISO 문자열 대신 typed array로 보낸다.
+            x=prices.date.astype("datetime64[ms]").astype(np.float64) if compact else prices.date,
+            y=prices.close,
             mode="lines",
             name=title,
             line={"color": color, "width": 2},
@@ -294,107 +640,1359 @@ def make_line_chart(df: pd.DataFrame, title: str, color: str = "royalblue") -> g
         margin={"l": 10, "r": 10, "t": 35, "b": 20},
         template="plotly_white",
         yaxis={"range": [y_min - padding, y_max + padding], "showgrid": True, "fixedrange": False},
-        xaxis={"showgrid": False, "tickformat": "%Y-%m-%d", "nticks": 5},
+        xaxis={"type": "date", "showgrid": False, "tickformat": "%Y-%m-%d", "nticks": 5},
     )
     return fig
 
 
-def _download_yfinance(ticker: str, start: datetime, end: datetime, retries: int = 2) -> pd.DataFrame:
+@st.cache_resource(show_spinner=False)
+def _provider_slots() -> dict[str, threading.BoundedSemaphore]:
+    # 스크립트는 재실행마다 모듈 전역을 새로 만들므로 세션 간에 공유할 객체는 cache_resource에 둔다.
+    return {provider: threading.BoundedSemaphore(limit) for provider, limit in PROVIDER_CONCURRENCY.items()}
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def seconds_until_retry(self) -> float:
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                # 쿨다운이 지난 뒤 첫 호출도 실패하면 곧바로 다시 열린다.
+                self.opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.record(True)
+
+
+@st.cache_resource(show_spinner=False)
+def _provider_breakers() -> dict[str, CircuitBreaker]:
+    return {
+        provider: CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS) for provider in PROVIDER_LABELS
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def _negative_cache() -> tuple[dict[tuple[str, str], float], threading.Lock]:
+    return {}, threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while (delay := self.reserve()) > 0:
+            await asyncio.sleep(delay)
+
+
+@st.cache_resource(show_spinner=False)
+def _provider_rate_limits() -> dict[str, TokenBucket]:
+    return {provider: TokenBucket(rate, capacity) for provider, (rate, capacity) in PROVIDER_RATE_LIMITS.items()}
+
+
+class StageMetrics:
+    def __init__(self, sample_size: int):
+        self.sample_size = sample_size
+        self.started_at = datetime.now()
+        self.exported_at = 0.0
+        self.stages: dict[str, dict] = {}
+        self.events: dict[tuple[str, str], int] = {}
+        self.symbol_bytes: dict[tuple[str, str], list[int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = {
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "samples": deque(maxlen=self.sample_size),
+                }
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["samples"].append(seconds)
+
+    def count(self, event: str, label: str = "", amount: int = 1) -> None:
+        with self._lock:
+            self.events[(event, label)] = self.events.get((event, label), 0) + amount
+
+    def record_bytes(self, provider: str, symbol: str, nbytes: int) -> None:
+        with self._lock:
+            # [받은 횟수, 누적 바이트, 마지막으로 받은 바이트]
+            stats = self.symbol_bytes.setdefault((provider, symbol), [0, 0, 0])
+            stats[0] += 1
+            stats[1] += nbytes
+            stats[2] = nbytes
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = datetime.now()
+            self.stages.clear()
+            self.events.clear()
+            self.symbol_bytes.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {
+                name: (stats["count"], stats["total"], stats["max"], np.array(stats["samples"]))
+                for name, stats in self.stages.items()
+            }
+            events = dict(self.events)
+            symbol_bytes = {key: list(value) for key, value in self.symbol_bytes.items()}
+            started_at = self.started_at
+
+        caches = {}
+        cache_fields = {"cache_lookup": "lookups", "cache_miss": "misses"}
+        for (event, label), value in events.items():
+            if event in cache_fields:
+                caches.setdefault(label, {"lookups": 0, "misses": 0})[cache_fields[event]] = value
+        for stats in caches.values():
+            stats["hit_ratio"] = 1 - stats["misses"] / stats["lookups"] if stats["lookups"] else None
+
+        return {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "stages": {
+                name: {
+                    "count": count,
+                    "total_seconds": total,
+                    "max_seconds": longest,
+                    **{
+                        f"p{quantile}_seconds": float(np.percentile(samples, quantile))
+                        for quantile in (50, 95, 99)
+                    },
+                }
+                for name, (count, total, longest, samples) in sorted(stages.items())
+            },
+            "caches": dict(sorted(caches.items())),
+            "events": [
+                {"event": event, "label": label, "count": value}
+                for (event, label), value in sorted(events.items())
+                if event not in cache_fields
+            ],
+            "symbols": [
+                {"provider": provider, "symbol": symbol, "fetches": fetches, "bytes": total, "last_bytes": last}
+                for (provider, symbol), (fetches, total, last) in sorted(symbol_bytes.items())
+            ],
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def _stage_metrics() -> StageMetrics:
+    return StageMetrics(METRICS_SAMPLE_SIZE)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_metrics().observe(stage, time.perf_counter() - started)
+
+
+def count_event(event: str, label: str = "", amount: int = 1) -> None:
+    _stage_metrics().count(event, label, amount)
+
+
+def _prometheus_labels(**labels: str) -> str:
+    escaped = {
+        key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for key, value in labels.items()
+    }
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+
+def metrics_prometheus(snapshot: dict) -> str:
+    lines = [
+        "# HELP dashboard_stage_seconds Duration of instrumented dashboard stages.",
+        "# TYPE dashboard_stage_seconds summary",
+    ]
+    for stage, stats in snapshot["stages"].items():
+        for quantile in (50, 95, 99):
+            labels = _prometheus_labels(stage=stage, quantile=str(quantile / 100))
+            lines.append(f"dashboard_stage_seconds{labels} {stats[f'p{quantile}_seconds']:.6f}")
+        lines.append(f"dashboard_stage_seconds_sum{_prometheus_labels(stage=stage)} {stats['total_seconds']:.6f}")
+        lines.append(f"dashboard_stage_seconds_count{_prometheus_labels(stage=stage)} {stats['count']}")
+
+    lines += ["# HELP dashboard_cache_lookups_total Cache lookups.", "# TYPE dashboard_cache_lookups_total counter"]
+    lines += [
+        f"dashboard_cache_lookups_total{_prometheus_labels(cache=cache)} {stats['lookups']}"
+        for cache, stats in snapshot["caches"].items()
+    ]
+    lines += ["# HELP dashboard_cache_misses_total Cache misses.", "# TYPE dashboard_cache_misses_total counter"]
+    lines += [
+        f"dashboard_cache_misses_total{_prometheus_labels(cache=cache)} {stats['misses']}"
+        for cache, stats in snapshot["caches"].items()
+    ]
+    lines += ["# HELP dashboard_events_total Retries, provider errors and other events.", "# TYPE dashboard_events_total counter"]
+    lines += [
+        f"dashboard_events_total{_prometheus_labels(event=item['event'], label=item['label'])} {item['count']}"
+        for item in snapshot["events"]
+    ]
+    lines += [
+        "# HELP dashboard_symbol_bytes_total Bytes of price data fetched per symbol.",
+        "# TYPE dashboard_symbol_bytes_total counter",
+    ]
+    lines += [
+        f"dashboard_symbol_bytes_total{_prometheus_labels(provider=item['provider'], symbol=item['symbol'])} {item['bytes']}"
+        for item in snapshot["symbols"]
+    ]
+    lines += [
+        "# HELP dashboard_symbol_fetches_total Provider fetches per symbol.",
+        "# TYPE dashboard_symbol_fetches_total counter",
+    ]
+    lines += [
+        f"dashboard_symbol_fetches_total{_prometheus_labels(provider=item['provider'], symbol=item['symbol'])} {item['fetches']}"
+        for item in snapshot["symbols"]
+    ]
+    memory = snapshot.get("price_memory")
+    if memory is not None:
+        lines += [
+            "# HELP dashboard_price_memory_bytes Bytes of price data held in memory.",
+            "# TYPE dashboard_price_memory_bytes gauge",
+            f"dashboard_price_memory_bytes {memory['bytes']}",
+            "# HELP dashboard_price_memory_budget_bytes Memory budget for price data.",
+            "# TYPE dashboard_price_memory_budget_bytes gauge",
+            f"dashboard_price_memory_budget_bytes {memory['budget_bytes']}",
+            "# HELP dashboard_price_memory_entries Symbols held in memory.",
+            "# TYPE dashboard_price_memory_entries gauge",
+            f"dashboard_price_memory_entries {memory['entries']}",
+            "# HELP dashboard_price_memory_evictions_total Symbols evicted to stay within the budget.",
+            "# TYPE dashboard_price_memory_evictions_total counter",
+            f"dashboard_price_memory_evictions_total {memory['evictions']}",
+        ]
+    in_flight = snapshot.get("in_flight")
+    if in_flight is not None:
+        lines += [
+            "# HELP dashboard_in_flight_fetches Symbols being fetched from a provider right now.",
+            "# TYPE dashboard_in_flight_fetches gauge",
+            f"dashboard_in_flight_fetches {in_flight['fetches']}",
+            "# HELP dashboard_revalidating_symbols Stale symbols queued or running for background refresh.",
+            "# TYPE dashboard_revalidating_symbols gauge",
+            f"dashboard_revalidating_symbols {in_flight['revalidating']}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_snapshot() -> dict:
+    snapshot = _stage_metrics().snapshot()
+    memory = _price_memory().stats()
+    snapshot["caches"]["price_memory"] = {
+        "lookups": memory["hits"] + memory["misses"],
+        "misses": memory["misses"],
+        "hit_ratio": memory["hit_ratio"],
+    }
+    snapshot["price_memory"] = memory
+    snapshot["in_flight"] = {
+        "fetches": _single_flight().in_flight(),
+        "revalidating": _background_refresher().in_flight(),
+    }
+    return snapshot
+
+
+def export_metrics(force: bool = False) -> None:
+    metrics = _stage_metrics()
+    if METRICS_EXPORT_DIR is None:
+        return
+    if not force and time.monotonic() - metrics.exported_at < METRICS_EXPORT_INTERVAL_SECONDS:
+        return
+    metrics.exported_at = time.monotonic()
+
+    snapshot = metrics_snapshot()
+    outputs = {
+        "metrics.json": json.dumps(snapshot, ensure_ascii=False, indent=2),
+        "metrics.prom": metrics_prometheus(snapshot),
+    }
+    for name, text in outputs.items():
+        path = METRICS_EXPORT_DIR / name
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+
+
+T = TypeVar("T")
+# run_data_tasks가 이벤트 루프마다 새로 채운다. asyncio 세마포어는 루프에 묶여 있어 공유할 수 없다.
+_DATA_EXECUTOR: ContextVar[ThreadPoolExecutor] = ContextVar("data_executor")
+_DATA_SLOTS: ContextVar[dict[str, asyncio.Semaphore]] = ContextVar("data_slots")
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DATA_EXECUTOR.get(), lambda: func(*args, **kwargs))
+
+
+def _call_in_provider_slot(provider: str, func: Callable[..., T], *args, **kwargs) -> T:
+    with _provider_slots()[provider], timed_stage(f"provider.{provider}"):
+        return func(*args, **kwargs)
+
+
+async def _provider_call(provider: str, func: Callable[..., T], *args, **kwargs) -> T:
+    queued_at = time.perf_counter()
+    async with _DATA_SLOTS.get()[provider]:
+        await _provider_rate_limits()[provider].acquire()
+        # 동시 실행 한도와 요청 속도 제한 때문에 기다린 시간
+        _stage_metrics().observe(f"queue.{provider}", time.perf_counter() - queued_at)
+        return await run_blocking(_call_in_provider_slot, provider, func, *args, **kwargs)
+
+
+def run_data_tasks(job: Awaitable[T], max_workers: int = PREFETCH_MAX_WORKERS) -> T:
+    # 백그라운드 갱신처럼 세션 밖에서 부르면 붙일 컨텍스트가 없다. 이때 None을 넘기면 작업 스레드에서 다시 찾다가
+    # 경고를 남기므로 아예 붙이지 않는다.
+    ctx = get_script_run_ctx(suppress_warning=True)
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=None if ctx is None else lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+    async def main() -> T:
+        _DATA_EXECUTOR.set(executor)
+        _DATA_SLOTS.set({provider: asyncio.Semaphore(limit) for provider, limit in PROVIDER_CONCURRENCY.items()})
+        return await job
+
+    try:
+        return asyncio.run(main())
+    finally:
+        # 아직 시작하지 않은 요청은 버린다. 이미 스레드에서 돌고 있는 호출은 끝까지 돌지만, 기다리던 코루틴이 취소되어
+        # 받은 봉은 저장소에 쓰지 않고 버려진다. 다음 실행에서 필요하면 다시 받는다.
+        executor.shutdown(wait=False, cancel_futures=True)
+        # 요청마다 종목 해석 파일을 다시 쓰지 않도록 모아 두었다가 여기서 한 번만 쓴다.
+        flush_ticker_resolution()
+
+
+async def gather_with_progress(
+    jobs: dict[str, Awaitable[T]], timeout: float | None = None, label: str | None = None
+) -> dict[str, T]:
+    tasks = {asyncio.ensure_future(job): key for key, job in jobs.items()}
+    placeholder = st.empty() if label else None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = set(tasks)
+    try:
+        while pending:
+            wait_for = DATA_PROGRESS_INTERVAL_SECONDS
+            if deadline is not None:
+                wait_for = min(wait_for, deadline - time.monotonic())
+                if wait_for <= 0:
+                    break
+            _, pending = await asyncio.wait(pending, timeout=wait_for)
+            if placeholder is not None:
+                # 화면을 갱신할 때 Streamlit이 재실행 요청을 확인한다. 사용자가 입력을 바꾸면 여기서 중단되고
+                # 남은 요청은 취소된다.
+                placeholder.caption(f"{label} ({len(tasks) - len(pending)}/{len(tasks)})")
+    finally:
+        for task in pending:
+            task.cancel()
+        if placeholder is not None:
+            placeholder.empty()
+
+    return {
+        key: task.result()
+        for task, key in tasks.items()
+        if task.done() and not task.cancelled() and task.exception() is None
+    }
+
+
+def price_fingerprint(prices: PriceSeries) -> str:
+    if prices.empty:
+        return "empty"
+    digest = hashlib.blake2b(digest_size=16)
+    for name in PRICE_COLUMNS:
+        digest.update(np.ascontiguousarray(getattr(prices, name)).view(np.uint8))
+    return digest.hexdigest()
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _memoized_chart(kind: str, fingerprint: str, options: tuple, _prices: PriceSeries) -> go.Figure:
+    count_event("cache_miss", "figure")
+    builder = make_price_volume_chart if kind == "price_volume" else make_line_chart
+    with timed_stage(f"chart.{kind}"):
+        return builder(_prices, **dict(options))
+
+
+def memoized_chart(kind: str, prices: PriceSeries, **options) -> go.Figure:
+    # 같은 데이터·옵션이면 재실행과 세션을 넘어 이미 만든 Figure를 그대로 돌려준다.
+    count_event("cache_lookup", "figure")
+    return _memoized_chart(kind, price_fingerprint(prices), tuple(sorted(options.items())), prices)
+
+
+async def _download_yfinance(ticker: str, start: datetime, end: datetime, retries: int = 2) -> PriceSeries | None:
+    # None은 요청 자체가 실패했다는 뜻이고, 빈 결과는 그 구간에 봉이 없다는 뜻이다. 없는 종목이나 휴장 구간의 빈
+    # 결과는 다시 요청하지 않고 차단기 실패로도 세지 않는다.
+    breaker = _provider_breakers()["yf"]
     for attempt in range(retries + 1):
+        if breaker.is_open():
+            return None
         try:
-            df = yf.download(ticker, start=start, end=end, progress=False, interval="1d", auto_adjust=False)
+            df = await _provider_call(
+                "yf", yf.download, ticker, start=start, end=end, progress=False, interval="1d", auto_adjust=False
+            )
+        except Exception:
+            count_event("provider_error", "yf")
+        else:
             frame = normalize_price_frame(df)
             if not frame.empty:
-                return frame
-        except Exception:
-            pass
+                breaker.record(True)
+            return frame
         if attempt < retries:
-            time.sleep(0.6 * (attempt + 1))
-    return pd.DataFrame()
+            count_event("retry", "yf")
+            with timed_stage("retry_wait.yf"):
+                await asyncio.sleep(0.6 * (attempt + 1))
+    breaker.record(False)
+    return None
 
 
-@st.cache_data(ttl=60 * 30, show_spinner=False)
-def get_market_history(symbol: str, provider: str, start: datetime, end: datetime) -> pd.DataFrame:
-    if provider == "fdr":
+def _select_ticker_frame(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame()
+    if isinstance(df.columns, pd.MultiIndex):
+        if ticker not in df.columns.get_level_values(0):
+            return pd.DataFrame()
+        return df[ticker]
+    return df
+
+
+async def _download_yfinance_batch(
+    tickers: list[str], start: datetime, end: datetime, retries: int = 2
+) -> dict[str, PriceSeries | None]:
+    # 일부 종목만 비어 있으면 그 종목의 문제이므로 다시 요청하지 않는다. 예외가 났거나, 거래일이 충분한 구간인데
+    # 모든 종목이 비어 돌아왔을 때만 요청 실패로 보고 다시 시도한다.
+    breaker = _provider_breakers()["yf"]
+    trading_days = np.busday_count(start.date(), end.date())
+    for attempt in range(retries + 1):
+        if breaker.is_open():
+            return dict.fromkeys(tickers)
         try:
-            return normalize_price_frame(fdr.DataReader(symbol, start, end))
+            df = await _provider_call(
+                "yf",
+                yf.download,
+                tickers,
+                start=start,
+                end=end,
+                progress=False,
+                interval="1d",
+                auto_adjust=False,
+                group_by="ticker",
+            )
         except Exception:
-            return pd.DataFrame()
-    return _download_yfinance(symbol, start, end)
+            count_event("provider_error", "yf")
+        else:
+            frames = {ticker: normalize_price_frame(_select_ticker_frame(df, ticker)) for ticker in tickers}
+            loaded = any(not frame.empty for frame in frames.values())
+            if loaded or trading_days < BREAKER_EMPTY_BATCH_BUSINESS_DAYS:
+                if loaded:
+                    breaker.record(True)
+                return frames
+        if attempt < retries:
+            count_event("retry", "yf", len(tickers))
+            with timed_stage("retry_wait.yf"):
+                await asyncio.sleep(0.6 * (attempt + 1))
+    breaker.record(False)
+    return dict.fromkeys(tickers)
 
 
-@st.cache_data(ttl=60 * 30, show_spinner=False)
-def get_stock_history(ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
-    normalized = normalize_ticker(ticker)
-    if not normalized:
-        return pd.DataFrame()
+async def _fetch_fdr(symbol: str, start: datetime, end: datetime) -> PriceSeries | None:
+    breaker = _provider_breakers()["fdr"]
+    if breaker.is_open():
+        return None
+    try:
+        df = await _provider_call("fdr", fdr.DataReader, symbol, start, end)
+        frame = normalize_price_frame(df)
+    except Exception:
+        count_event("provider_error", "fdr")
+        breaker.record(False)
+        return None
+    if not frame.empty:
+        breaker.record(True)
+    return frame
+
+
+def _negative_cache_remaining(provider: str, symbol: str) -> float:
+    failures, lock = _negative_cache()
+    with lock:
+        expires_at = failures.get((provider, symbol))
+        if expires_at is None:
+            return 0.0
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            del failures[(provider, symbol)]
+            return 0.0
+        return remaining
+
+
+def _remember_fetch_result(provider: str, symbol: str, ok: bool) -> None:
+    failures, lock = _negative_cache()
+    with lock:
+        if ok:
+            failures.pop((provider, symbol), None)
+        else:
+            failures[(provider, symbol)] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
+
+
+def negative_cache_snapshot() -> list[tuple[str, str, float]]:
+    failures, lock = _negative_cache()
+    with lock:
+        keys = list(failures)
+    items = [(provider, symbol, _negative_cache_remaining(provider, symbol)) for provider, symbol in keys]
+    return sorted([item for item in items if item[2] > 0], key=lambda item: -item[2])
+
+
+def clear_fetch_failures() -> None:
+    failures, lock = _negative_cache()
+    with lock:
+        failures.clear()
+    for breaker in _provider_breakers().values():
+        breaker.reset()
+
 
-    if re.fullmatch(r"\d{6}", normalized):
+def describe_fetch_failure(sources: list[tuple[str, str]]) -> str:
+    providers = dict.fromkeys(provider for provider, _ in sources)
+    open_providers = [PROVIDER_LABELS[provider] for provider in providers if _provider_breakers()[provider].is_open()]
+    if open_providers:
+        return f"{', '.join(open_providers)} 요청이 연속으로 실패해 잠시 호출을 멈췄습니다."
+
+    remaining = [_negative_cache_remaining(provider, symbol) for provider, symbol in sources]
+    if remaining and all(value > 0 for value in remaining):
+        minutes = max(1, round(max(remaining) / 60))
+        return f"최근 조회에 실패한 종목이라 약 {minutes}분 뒤에 다시 요청합니다."
+    return ""
+
+
+async def _fetch_provider(
+    provider: str, symbols: list[str], start: datetime, end: datetime
+) -> dict[str, PriceSeries | None]:
+    if provider == "fdr":
+        frames = await asyncio.gather(*(_fetch_fdr(symbol, start, end) for symbol in symbols))
+        return dict(zip(symbols, frames))
+    if len(symbols) == 1:
+        return {symbols[0]: await _download_yfinance(symbols[0], start, end)}
+    return await _download_yfinance_batch(symbols, start, end)
+
+
+class PriceMemory:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[tuple[BarPyramid, dict], int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> tuple[BarPyramid, dict] | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def peek(self, key: tuple[str, str]) -> tuple[BarPyramid, dict] | None:
+        with self._lock:
+            item = self._entries.get(key)
+            return None if item is None else item[0]
+
+    def put(self, key: tuple[str, str], entry: tuple[BarPyramid, dict]) -> None:
+        size = entry[0].nbytes
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = entry, size
+            self.nbytes += size
+            # 방금 넣은 항목은 예산보다 커도 남겨 둔다. 이번 요청이 곧바로 쓴다.
+            while self.nbytes > self.budget_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def _price_memory() -> PriceMemory:
+    return PriceMemory(PRICE_MEMORY_BUDGET_BYTES)
+
+
+@st.cache_resource(show_spinner=False)
+def _price_store_locks() -> tuple[dict[tuple[str, str], threading.Lock], threading.Lock]:
+    return {}, threading.Lock()
+
+
+def _price_store_lock(provider: str, symbol: str) -> threading.Lock:
+    locks, guard = _price_store_locks()
+    with guard:
+        return locks.setdefault((provider, symbol), threading.Lock())
+
+
+class BackgroundRefresher:
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price-refresh")
+        self._pending: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, provider: str, symbols: list[str], start: datetime, end: datetime, refresh_seconds: float) -> int:
+        with self._lock:
+            # 이미 갱신 중인 종목은 다시 예약하지 않는다.
+            symbols = [symbol for symbol in symbols if (provider, symbol) not in self._pending]
+            self._pending.update((provider, symbol) for symbol in symbols)
+        if symbols:
+            self._executor.submit(self._refresh, provider, symbols, start, end, refresh_seconds)
+        return len(symbols)
+
+    def _refresh(self, provider: str, symbols: list[str], start: datetime, end: datetime, refresh_seconds: float) -> None:
         try:
-            frame = normalize_price_frame(fdr.DataReader(normalized, start, end))
-            if not frame.empty:
-                return frame
+            with timed_stage(f"revalidate.{provider}"):
+                run_data_tasks(
+                    fetch_price_histories(provider, symbols, start, end, refresh_seconds=refresh_seconds, stale_ok=False)
+                )
         except Exception:
-            pass
+            count_event("provider_error", provider)
+        finally:
+            with self._lock:
+                self._pending.difference_update((provider, symbol) for symbol in symbols)
+
+    def is_refreshing(self, provider: str, symbol: str) -> bool:
+        with self._lock:
+            return (provider, symbol) in self._pending
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+class FileLease:
+    # 잠금은 파일을 연 프로세스가 죽으면 운영체제가 풀어 주므로 남은 임대를 치울 필요가 없다. 파일은 지우지 않는다.
+    # 지우면 다른 프로세스가 같은 경로에 새 파일을 만들어 잠가 두 곳이 동시에 임대를 잡을 수 있다.
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def acquire(self) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        except OSError:
+            # 임대 파일을 만들 수 없는 저장소면 프로세스 사이 조율 없이 그냥 받는다.
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def is_held(self) -> bool:
+        # flock에는 잠금 여부만 묻는 방법이 없어 잠깐 잡아 보고 바로 푼다.
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            return False
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def wait(self, timeout: float = SHARED_LEASE_WAIT_SECONDS) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.is_held():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(SHARED_LEASE_POLL_SECONDS)
+        return True
 
-        for suffix in [".KS", ".KQ"]:
-            frame = _download_yfinance(normalized + suffix, start, end)
+
+def _price_lease(provider: str, symbol: str) -> FileLease:
+    return FileLease(PRICE_STORE_DIR / ".leases" / provider / f"{quote(symbol, safe='')}.lock")
+
+
+async def _wait_for_leases(leases: list[FileLease], deadline: float) -> bool:
+    while any(lease.is_held() for lease in leases):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(SHARED_LEASE_POLL_SECONDS)
+    return True
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict[tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, provider: str, symbols: list[str]) -> tuple[list[str], dict[str, Future]]:
+        owned, waiting = [], {}
+        with self._lock:
+            for symbol in symbols:
+                flight = self._flights.get((provider, symbol))
+                if flight is None:
+                    self._flights[(provider, symbol)] = Future()
+                    owned.append(symbol)
+                else:
+                    waiting[symbol] = flight
+        return owned, waiting
+
+    def release(self, provider: str, symbols: list[str]) -> None:
+        with self._lock:
+            flights = [self._flights.pop((provider, symbol)) for symbol in symbols]
+        for flight in flights:
+            flight.set_result(None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+@st.cache_resource(show_spinner=False)
+def _single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+@st.cache_resource(show_spinner=False)
+def _background_refresher() -> BackgroundRefresher:
+    return BackgroundRefresher(PRICE_REFRESH_WORKERS)
+
+
+def _price_store_path(provider: str, symbol: str) -> Path:
+    return PRICE_STORE_DIR / provider / f"{quote(symbol, safe='')}.parquet"
+
+
+def _read_price_store(provider: str, symbol: str) -> tuple[PriceSeries, dict] | None:
+    path = _price_store_path(provider, symbol)
+    if not path.exists():
+        return None
+    try:
+        with timed_stage("store.read"):
+            table = pq.read_table(path, columns=list(PRICE_COLUMNS))
+        meta = json.loads(table.schema.metadata[b"price_store"])
+        prices = PriceSeries.from_columns(**{name: table.column(name).to_numpy() for name in PRICE_COLUMNS})
+        return prices, {
+            "start": datetime.fromisoformat(meta["start"]),
+            "end": datetime.fromisoformat(meta["end"]),
+            "fetched_at": datetime.fromisoformat(meta["fetched_at"]),
+        }
+    except Exception:
+        return None
+
+
+def _write_price_store(provider: str, symbol: str, prices: PriceSeries, meta: dict) -> None:
+    path = _price_store_path(provider, symbol)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.table({name: getattr(prices, name) for name in PRICE_COLUMNS})
+        encoded = json.dumps({key: value.isoformat() for key, value in meta.items()})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"price_store": encoded})
+        with timed_stage("store.write"):
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _price_store_meta(provider: str, symbol: str) -> dict | None:
+    try:
+        metadata = pq.read_schema(_price_store_path(provider, symbol)).metadata
+        return {key: datetime.fromisoformat(value) for key, value in json.loads(metadata[b"price_store"]).items()}
+    except Exception:
+        return None
+
+
+def _load_price_entry(provider: str, symbol: str) -> tuple[BarPyramid, dict] | None:
+    stored = _read_price_store(provider, symbol)
+    if stored is None:
+        return None
+    # 주봉/월봉은 디스크에 따로 두지 않고 처음 읽을 때 일봉에서 한 번 만든다.
+    with timed_stage("bars.build"):
+        entry = BarPyramid.build(stored[0]), stored[1]
+    _price_memory().put((provider, symbol), entry)
+    return entry
+
+
+def _get_price_entry(provider: str, symbol: str) -> tuple[BarPyramid, dict] | None:
+    entry = _price_memory().get((provider, symbol))
+    if entry is None:
+        entry = _load_price_entry(provider, symbol)
+    return entry
+
+
+def _reload_price_entry(provider: str, symbol: str, entry: tuple[BarPyramid, dict]) -> tuple[BarPyramid, dict]:
+    # 예열 작업이나 다른 레플리카가 저장소를 고쳤으면 다시 받지 않고 그 내용을 쓴다. 저장소 쓰기는 임대를 잡은
+    # 프로세스 하나씩 기존 내용에 합쳐 쓰므로 디스크 쪽이 항상 가장 넓다.
+    with _price_store_lock(provider, symbol):
+        stored = _price_store_meta(provider, symbol)
+        if stored is None or stored == entry[1]:
+            return entry
+        return _load_price_entry(provider, symbol) or entry
+
+
+def _price_store_gaps(
+    entry: tuple[BarPyramid, dict] | None,
+    start: datetime,
+    end: datetime,
+    now: datetime,
+    refresh_seconds: float = PRICE_STORE_REFRESH_SECONDS,
+) -> list[tuple[datetime, datetime]]:
+    if entry is None:
+        return [(start, end)]
+
+    # 앞쪽과 뒤쪽 빈 구간은 따로 돌려준다. 하나로 합치면 그 사이의 이미 받은 구간까지 다시 받는다.
+    stored, meta = entry[0].daily, entry[1]
+    gaps = []
+    listing_known = pd.Timestamp(stored.date[0]) - pd.Timestamp(meta["start"]) > PRICE_STORE_LISTING_GAP
+    if start < meta["start"] and not listing_known:
+        gaps.append((start, meta["start"]))
+
+    # 받을 때 현재 시각까지 받은 구간이면 마지막 봉이 장중 미완성 봉일 수 있어 갱신 주기가 지난 뒤 그 날짜부터 다시
+    # 받는다. 과거 시점에서 끝난 구간이면 그 뒤는 한 번도 받지 않은 구간이므로 곧바로 받는다.
+    live_tail = meta["end"] >= meta["fetched_at"]
+    if end > meta["end"] and (not live_tail or now - meta["fetched_at"] >= timedelta(seconds=refresh_seconds)):
+        tail_start = pd.Timestamp(stored.date[-1]).to_pydatetime() if live_tail else meta["end"]
+        gaps.append((tail_start, end))
+    return gaps
+
+
+def _is_recent_tail(
+    entry: tuple[BarPyramid, dict] | None, gaps: list[tuple[datetime, datetime]], end: datetime, now: datetime
+) -> bool:
+    if entry is None or len(gaps) != 1:
+        return False
+    meta = entry[1]
+    if meta["end"] < meta["fetched_at"] or gaps[0][0] < pd.Timestamp(entry[0].daily.date[-1]):
+        return False
+    return np.busday_count(meta["end"].date(), min(end, now).date()) <= STALE_MAX_BUSINESS_DAYS
+
+
+def _batch_gaps(gaps: dict[str, list[tuple[datetime, datetime]]]) -> list[tuple[datetime, datetime, list[str]]]:
+    # 양 끝이 며칠 안쪽으로 맞는 구간끼리만 한 요청으로 묶는다. 멀리 떨어진 구간까지 합치면 종목마다 이미 받은 구간을
+    # 다시 받게 된다.
+    batches: list[list] = []
+    for symbol, symbol_gaps in gaps.items():
+        for gap_start, gap_end in symbol_gaps:
+            for batch in batches:
+                if abs(batch[0] - gap_start) <= PRICE_BATCH_SLACK and abs(batch[1] - gap_end) <= PRICE_BATCH_SLACK:
+                    batch[0], batch[1] = min(batch[0], gap_start), max(batch[1], gap_end)
+                    if symbol not in batch[2]:
+                        batch[2].append(symbol)
+                    break
+            else:
+                batches.append([gap_start, gap_end, [symbol]])
+    return [(batch_start, batch_end, symbols) for batch_start, batch_end, symbols in batches]
+
+
+def _update_price_store(
+    provider: str, symbol: str, fetched: PriceSeries, start: datetime, end: datetime, now: datetime
+) -> tuple[BarPyramid, dict] | None:
+    with _price_store_lock(provider, symbol):
+        # 요청 전에 찾아본 뒤 다른 요청이나 다른 프로세스가 고쳤을 수 있어 다시 읽는다. 적중률에는 넣지 않는다.
+        entry = _price_memory().peek((provider, symbol))
+        if entry is None or _price_store_meta(provider, symbol) not in (None, entry[1]):
+            entry = _load_price_entry(provider, symbol)
+        covered_end = min(end, now)
+        if entry is None:
+            if fetched.empty:
+                return None
+            prices = fetched
+            with timed_stage("bars.build"):
+                pyramid = BarPyramid.build(prices)
+            meta = {"start": start, "end": covered_end, "fetched_at": now}
+        else:
+            stored, meta = entry
+            if fetched.empty:
+                # 요청은 성공했는데 봉이 없으면(주말, 휴장일, 상장 전) 그 구간은 비어 있는 것으로 보고 범위만 넓힌다.
+                prices, pyramid = stored.daily, stored
+            else:
+                with timed_stage("bars.extend"):
+                    prices = stored.daily.merge(fetched)
+                    pyramid = stored.extend(prices, fetched.date[0])
+            refreshed_tail = end >= meta["end"]
+            meta = {
+                "start": min(meta["start"], start),
+                "end": max(meta["end"], covered_end),
+                "fetched_at": now if refreshed_tail else meta["fetched_at"],
+            }
+        _write_price_store(provider, symbol, prices, meta)
+        _price_memory().put((provider, symbol), (pyramid, meta))
+        return pyramid, meta
+
+
+async def _fetch_into_store(
+    provider: str, symbols: list[str], gaps: dict[str, list[tuple[datetime, datetime]]], now: datetime
+) -> dict[str, tuple[BarPyramid, dict] | None]:
+    batches = _batch_gaps({symbol: gaps[symbol] for symbol in symbols})
+    with timed_stage(f"fetch.{provider}"):
+        results = await asyncio.gather(
+            *(_fetch_provider(provider, batch_symbols, batch_start, batch_end) for batch_start, batch_end, batch_symbols in batches)
+        )
+    breaker_open = _provider_breakers()[provider].is_open()
+    metrics = _stage_metrics()
+    entries = {}
+    failed = set()
+    for (batch_start, batch_end, batch_symbols), fetched in zip(batches, results):
+        for symbol in batch_symbols:
+            frame = fetched.get(symbol)
+            if frame is None:
+                failed.add(symbol)
+                continue
             if not frame.empty:
-                return frame
-        return pd.DataFrame()
+                metrics.record_bytes(provider, symbol, frame.nbytes)
+            entries[symbol] = _update_price_store(provider, symbol, frame, batch_start, batch_end, now)
+            # 저장된 데이터도 없는데 빈 결과가 왔으면 없는 종목일 수 있어 잠시 다시 묻지 않는다.
+            if entries[symbol] is None:
+                failed.add(symbol)
+    for symbol in symbols:
+        if symbol not in failed or not breaker_open:
+            _remember_fetch_result(provider, symbol, symbol not in failed)
+    return entries
+
+
+async def fetch_price_histories(
+    provider: str,
+    symbols: list[str],
+    start: datetime,
+    end: datetime,
+    timeframe: str = "일봉",
+    refresh_seconds: float = PRICE_STORE_REFRESH_SECONDS,
+    stale_ok: bool = True,
+) -> dict[str, PriceSeries]:
+    now = datetime.now()
+    entries = {symbol: _get_price_entry(provider, symbol) for symbol in symbols}
+    gaps = {symbol: _price_store_gaps(entry, start, end, now, refresh_seconds) for symbol, entry in entries.items()}
+    for symbol, symbol_gaps in gaps.items():
+        if symbol_gaps and entries[symbol] is not None:
+            entries[symbol] = _reload_price_entry(provider, symbol, entries[symbol])
+            gaps[symbol] = _price_store_gaps(entries[symbol], start, end, now, refresh_seconds)
+    pending = [
+        symbol
+        for symbol, symbol_gaps in gaps.items()
+        if symbol_gaps and _negative_cache_remaining(provider, symbol) <= 0
+    ]
+    count_event("cache_lookup", "price_store", len(gaps))
+    count_event("cache_miss", "price_store", sum(bool(symbol_gaps) for symbol_gaps in gaps.values()))
+
+    if stale_ok and STALE_WHILE_REVALIDATE:
+        # 요청 구간을 이미 덮고 있고 최근에 현재 시각까지 받아 둔 종목만 저장된 데이터를 바로 돌려준다. 한 번도
+        # 받지 않았거나 오래 비어 있는 뒤쪽 구간은 여기서 받는다.
+        stale = [
+            symbol
+            for symbol in pending
+            if _is_recent_tail(entries[symbol], gaps[symbol], end, now)
+        ]
+        if stale:
+            count_event("stale_served", provider, len(stale))
+            count_event("revalidate", provider, _background_refresher().submit(provider, stale, start, end, refresh_seconds))
+            pending = [symbol for symbol in pending if symbol not in stale]
+
+    lease_deadline = time.monotonic() + SHARED_LEASE_WAIT_SECONDS
+    while pending and not _provider_breakers()[provider].is_open():
+        # 다른 세션이 이미 받고 있는 종목은 그 요청이 끝나기를 기다렸다가 저장소에서 읽는다. 같은 저장소를 쓰는
+        # 다른 프로세스가 받고 있는 종목은 임대 파일이 풀리기를 기다린다.
+        owned, waiting = _single_flight().claim(provider, pending)
+        leases = {symbol: _price_lease(provider, symbol) for symbol in owned}
+        elsewhere = [symbol for symbol, lease in leases.items() if not lease.acquire()]
+        lease_released = True
+        try:
+            fetching = []
+            for symbol in owned:
+                if symbol in elsewhere:
+                    continue
+                # 임대를 잡기 직전에 다른 프로세스가 받아 두었을 수 있다.
+                if entries[symbol] is not None:
+                    entries[symbol] = _reload_price_entry(provider, symbol, entries[symbol])
+                else:
+                    entries[symbol] = _load_price_entry(provider, symbol)
+                gaps[symbol] = _price_store_gaps(entries[symbol], start, end, now, refresh_seconds)
+                if gaps[symbol]:
+                    fetching.append(symbol)
+            if fetching:
+                entries.update(await _fetch_into_store(provider, fetching, gaps, now))
+            # 잡은 임대를 쥔 채 다른 프로세스의 임대를 기다리면 두 프로세스가 서로를 기다리며 멈춘다.
+            for lease in leases.values():
+                lease.release()
+            if elsewhere:
+                count_event("lease_wait", provider, len(elsewhere))
+                with timed_stage(f"lease_wait.{provider}"):
+                    lease_released = await _wait_for_leases([leases[symbol] for symbol in elsewhere], lease_deadline)
+        finally:
+            for lease in leases.values():
+                lease.release()
+            _single_flight().release(provider, owned)
+        if waiting:
+            count_event("coalesced", provider, len(waiting))
+        # 기다리던 쪽이 취소되어도 먼저 받던 요청의 Future는 그대로 둔다.
+        await asyncio.gather(*(asyncio.shield(asyncio.wrap_future(future)) for future in waiting.values()))
+
+        pending = []
+        for symbol in [*waiting, *elsewhere]:
+            entry = _get_price_entry(provider, symbol)
+            entries[symbol] = entry if entry is None else _reload_price_entry(provider, symbol, entry)
+            gaps[symbol] = _price_store_gaps(entries[symbol], start, end, now, refresh_seconds)
+            # 먼저 받던 요청과 구간이 달라 아직 빈 곳이 남았으면 다음 차례에 직접 받는다. 다른 프로세스가 기다릴 수 있는
+            # 시간 안에 받기를 끝내지 못했으면 다시 받지 않고 저장된 데이터를 돌려준다.
+            if symbol in elsewhere and not lease_released:
+                continue
+            if gaps[symbol] and _negative_cache_remaining(provider, symbol) <= 0:
+                pending.append(symbol)
+
+    return {
+        symbol: entry[0].bars(timeframe).slice_dates(start, end) if entry is not None else EMPTY_PRICES
+        for symbol, entry in entries.items()
+    }
+
+
+async def fetch_price_history(
+    provider: str, symbol: str, start: datetime, end: datetime, timeframe: str = "일봉"
+) -> PriceSeries:
+    return (await fetch_price_histories(provider, [symbol], start, end, timeframe))[symbol]
 
-    return _download_yfinance(normalized, start, end)
 
+async def fetch_market_histories(
+    start: datetime, end: datetime, refresh_seconds: float = PRICE_STORE_REFRESH_SECONDS
+) -> dict[str, PriceSeries]:
+    yf_symbols = [item["symbol"] for item in MARKET_TICKERS if item["provider"] == "yf"]
+    fdr_symbols = [item["symbol"] for item in MARKET_TICKERS if item["provider"] == "fdr"]
+    yf_frames, fdr_frames = await asyncio.gather(
+        fetch_price_histories("yf", yf_symbols, start, end, refresh_seconds=refresh_seconds),
+        fetch_price_histories("fdr", fdr_symbols, start, end, refresh_seconds=refresh_seconds),
+    )
+    return {**yf_frames, **fdr_frames}
+
+
+def get_market_histories(
+    start: datetime, end: datetime, refresh_seconds: float = PRICE_STORE_REFRESH_SECONDS
+) -> dict[str, PriceSeries]:
+    return run_data_tasks(fetch_market_histories(start, end, refresh_seconds))
 
-@st.cache_data(ttl=60 * 60 * 24, show_spinner=False)
-def get_krx_dict() -> dict[str, str]:
+
+@st.cache_resource(show_spinner=False)
+def _ticker_resolution() -> tuple[dict[str, dict], threading.Lock, set[str]]:
+    # 세 번째 값은 아직 파일에 쓰지 않은 종목코드다.
     try:
-        listing = fdr.StockListing("KRX")
+        index = json.loads(TICKER_RESOLUTION_PATH.read_text(encoding="utf-8"))
     except Exception:
+        index = {}
+    return index, threading.Lock(), set()
+
+
+def _save_ticker_resolution(index: dict[str, dict]) -> None:
+    tmp_path = TICKER_RESOLUTION_PATH.with_name(f"{TICKER_RESOLUTION_PATH.name}.{os.getpid()}.tmp")
+    try:
+        TICKER_RESOLUTION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, TICKER_RESOLUTION_PATH)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+
+
+def seed_ticker_resolution(markets: dict[str, str]) -> None:
+    index, lock, unsaved = _ticker_resolution()
+    with lock:
+        for code, market in markets.items():
+            entry = index.setdefault(code, {})
+            if entry.get("market") != market:
+                entry["market"] = market
+                unsaved.add(code)
+    flush_ticker_resolution()
+
+
+def _record_ticker_resolution(code: str, provider: str, symbol: str) -> None:
+    # 기본 순서의 첫 후보(fdr)로 받았으면 적어 둘 필요가 없다. 파일은 요청 묶음이 끝날 때 한 번에 쓴다.
+    source = None if (provider, symbol) == ("fdr", code) else [provider, symbol]
+    index, lock, unsaved = _ticker_resolution()
+    with lock:
+        entry = index.get(code, {})
+        if entry.get("source") == source:
+            return
+        if source is None:
+            entry.pop("source")
+        else:
+            index.setdefault(code, entry)["source"] = source
+        unsaved.add(code)
+
+
+def flush_ticker_resolution() -> None:
+    index, lock, unsaved = _ticker_resolution()
+    with lock:
+        if unsaved:
+            _save_ticker_resolution(index)
+            unsaved.clear()
+
+
+def stock_history_sources(ticker: str) -> list[tuple[str, str]]:
+    normalized = normalize_ticker(ticker)
+    if not normalized:
+        return []
+    if not re.fullmatch(r"\d{6}", normalized):
+        return [("yf", normalized)]
+
+    entry = _ticker_resolution()[0].get(normalized, {})
+    suffixes = [".KQ", ".KS"] if entry.get("market") == "KOSDAQ" else [".KS", ".KQ"]
+    sources = [("fdr", normalized)] + [("yf", normalized + suffix) for suffix in suffixes]
+    resolved = tuple(entry.get("source", ()))
+    if resolved in sources:
+        sources.remove(resolved)
+        sources.insert(0, resolved)
+    return sources
+
+
+async def fetch_stock_history(
+    ticker: str, start: datetime, end: datetime, timeframe: str = "일봉"
+) -> PriceSeries:
+    sources = stock_history_sources(ticker)
+    for provider, symbol in sources:
+        frame = await fetch_price_history(provider, symbol, start, end, timeframe)
+        if not frame.empty:
+            if len(sources) > 1:
+                _record_ticker_resolution(normalize_ticker(ticker), provider, symbol)
+            return frame
+    return EMPTY_PRICES
+
+
+def prefetch_stock_histories(
+    tickers: Iterable[str],
+    start: datetime,
+    end: datetime,
+    timeframe: str = "일봉",
+    max_workers: int = PREFETCH_MAX_WORKERS,
+    timeout: float = PREFETCH_TIMEOUT_SECONDS,
+    progress_label: str | None = None,
+) -> dict[str, PriceSeries]:
+    normalized = list(dict.fromkeys(ticker for ticker in map(normalize_ticker, tickers) if ticker))
+    if not normalized:
         return {}
 
+    jobs = {ticker: fetch_stock_history(ticker, start, end, timeframe) for ticker in normalized}
+    with timed_stage("prefetch"):
+        return run_data_tasks(gather_with_progress(jobs, timeout, progress_label), max_workers)
+
+
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_CHOSEONG_TABLE = {code: _CHOSEONG[(code - 0xAC00) // 588] for code in range(0xAC00, 0xD7A4)}
+_HANGUL_PATTERN = re.compile(r"[\u3131-\u318e\uac00-\ud7a3]")
+
+
+def normalize_search_key(value: str) -> str:
+    return re.sub(r"[\W_]+", "", str(value)).lower()
+
+
+@dataclass(frozen=True)
+class KrxSymbolIndex:
+    displays: tuple[str, ...] = ()
+    display_to_ticker: dict[str, str] = field(default_factory=dict)
+    code_to_item: dict[str, tuple[str, str]] = field(default_factory=dict)
+    name_to_items: dict[str, list[tuple[str, str]]] = field(default_factory=dict)
+    key_to_items: dict[str, list[tuple[str, str]]] = field(default_factory=dict)
+    # (정규화한 종목명 또는 초성, 표시명)을 정렬해 두어 접두어 검색을 이분 탐색으로 처리한다.
+    search_keys: tuple[tuple[str, str], ...] = ()
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        key = normalize_search_key(query)
+        if not key:
+            return []
+
+        matches = {}
+        for search_key, display in islice(self.search_keys, bisect_left(self.search_keys, (key,)), None):
+            if not search_key.startswith(key) or len(matches) >= limit:
+                break
+            matches[display] = None
+        if not matches:
+            for search_key, display in self.search_keys:
+                if key in search_key:
+                    matches[display] = None
+                    if len(matches) >= limit:
+                        break
+        return list(matches)
+
+    def match_name(self, token: str, limit: int = 10) -> list[tuple[str, str]]:
+        if token in self.name_to_items:
+            return self.name_to_items[token]
+        if not _HANGUL_PATTERN.search(token):
+            return []
+
+        key = normalize_search_key(token)
+        if key in self.key_to_items:
+            return self.key_to_items[key]
+        return [(self.display_to_ticker[display], display) for display in self.search(token, limit)]
+
+
+def build_krx_index(listing: pd.DataFrame) -> KrxSymbolIndex:
     symbol_col = "Code" if "Code" in listing.columns else "Symbol"
-    name_col = "Name"
-    market_col = "Market" if "Market" in listing.columns else None
-    stock_dict = {}
-
-    for _, row in listing.iterrows():
-        name = row.get(name_col)
-        code = row.get(symbol_col)
-        market = str(row.get(market_col, "")).upper() if market_col else ""
-        if not name or pd.isna(code):
-            continue
+    if "Market" in listing.columns:
+        market = listing["Market"].fillna("").astype(str).str.upper()
+    else:
+        market = pd.Series("", index=listing.index)
+
+    valid = listing["Name"].notna() & listing[symbol_col].notna()
+    names = listing.loc[valid, "Name"].astype(str).str.strip()
+    codes = listing.loc[valid, symbol_col].astype(str).str.strip().str.zfill(6)
+    market = market[valid]
+    valid = codes.str.isdigit() & (names != "")
+    names, codes, market = names[valid], codes[valid], market[valid]
+
+    is_kospi = market.str.contains("KOSPI")
+    is_kosdaq = market.str.contains("KOSDAQ") & ~is_kospi
+    yahoo_codes = (codes + np.select([is_kospi, is_kosdaq], [".KS", ".KQ"], "")).tolist()
+    displays = (names + " (" + codes + ")").tolist()
+    name_keys = names.str.replace(r"[\W_]+", "", regex=True).str.lower().tolist()
+    choseong_keys = names.str.translate(_CHOSEONG_TABLE).str.replace(r"[\W_]+", "", regex=True).str.lower().tolist()
+
+    items = list(zip(yahoo_codes, displays))
+    name_to_items: dict[str, list[tuple[str, str]]] = {}
+    key_to_items: dict[str, list[tuple[str, str]]] = {}
+    for name, key, item in zip(names.tolist(), name_keys, items):
+        name_to_items.setdefault(name, []).append(item)
+        key_to_items.setdefault(key, []).append(item)
+
+    return KrxSymbolIndex(
+        displays=tuple(dict.fromkeys(displays)),
+        display_to_ticker=dict(zip(displays, yahoo_codes)),
+        code_to_item=dict(zip(codes.tolist(), items)),
+        name_to_items=name_to_items,
+        key_to_items=key_to_items,
+        search_keys=tuple(sorted(set(zip(name_keys, displays)) | set(zip(choseong_keys, displays)))),
+    )
 
-        code = str(code).strip().zfill(6)
-        if not code.isdigit():
-            continue
 
-        if "KOSPI" in market:
-            yahoo_code = code + ".KS"
-        elif "KOSDAQ" in market:
-            yahoo_code = code + ".KQ"
-        else:
-            yahoo_code = code
+def _read_krx_listing(max_age_seconds: float | None) -> pd.DataFrame | None:
+    try:
+        if max_age_seconds is not None and time.time() - KRX_LISTING_PATH.stat().st_mtime > max_age_seconds:
+            return None
+        return pd.read_parquet(KRX_LISTING_PATH)
+    except Exception:
+        return None
 
-        stock_dict[f"{name} ({code})"] = yahoo_code
-    return stock_dict
 
+def download_krx_listing() -> pd.DataFrame | None:
+    try:
+        listing = run_data_tasks(_provider_call("fdr", fdr.StockListing, "KRX"))
+    except Exception:
+        return None
 
-def build_krx_lookup(stock_dict: dict[str, str]):
-    display_to_ticker = dict(stock_dict)
-    code_to_item = {}
-    name_to_items = {}
+    # 종목 검색에 쓰는 컬럼만 문자열로 남겨 저장한다.
+    columns = [column for column in ("Code", "Symbol", "Name", "Market") if column in listing.columns]
+    stored = listing[columns].astype("string")
+    tmp_path = KRX_LISTING_PATH.with_name(f"{KRX_LISTING_PATH.name}.{os.getpid()}.tmp")
+    try:
+        KRX_LISTING_PATH.parent.mkdir(parents=True, exist_ok=True)
+        stored.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, KRX_LISTING_PATH)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+    return stored
+
+
+def _download_krx_listing_shared() -> pd.DataFrame | None:
+    # 같은 캐시 폴더를 쓰는 프로세스 중 한 곳만 내려받고, 나머지는 끝나기를 기다렸다가 그 파일을 읽는다.
+    lease = FileLease(KRX_LISTING_PATH.with_name(f"{KRX_LISTING_PATH.name}.lock"))
+    if not lease.acquire():
+        count_event("lease_wait", "krx_listing")
+        # 기다려도 끝나지 않으면 None을 돌려 오래된 목록이라도 쓰게 한다.
+        lease.wait()
+        return _read_krx_listing(KRX_LISTING_MAX_AGE_SECONDS)
+    try:
+        listing = _read_krx_listing(KRX_LISTING_MAX_AGE_SECONDS)
+        return listing if listing is not None else download_krx_listing()
+    finally:
+        lease.release()
+
+
+@st.cache_resource(ttl=60 * 60 * 24, show_spinner=False)
+def get_krx_index() -> KrxSymbolIndex:
+    # 미리 받아 둔 목록이 있으면 내려받지 않는다. 새로 받지 못하면 오래된 목록이라도 쓴다.
+    listing = _read_krx_listing(KRX_LISTING_MAX_AGE_SECONDS)
+    if listing is None:
+        listing = _download_krx_listing_shared()
+    if listing is None:
+        listing = _read_krx_listing(None)
+    if listing is None:
+        return KrxSymbolIndex()
+
+    index = build_krx_index(listing)
+    markets = {
+        code: "KOSPI" if yahoo_code.endswith(".KS") else "KOSDAQ"
+        for code, (yahoo_code, _) in index.code_to_item.items()
+        if yahoo_code.endswith((".KS", ".KQ"))
+    }
+    seed_ticker_resolution(markets)
+    return index
 
-    for display_name, yahoo_code in stock_dict.items():
-        match = re.match(r"^(.+)\s+\((\d{6})\)$", display_name)
-        if not match:
-            continue
-        stock_name = match.group(1).strip()
-        stock_code = match.group(2).strip()
-        code_to_item[stock_code] = (yahoo_code, display_name)
-        name_to_items.setdefault(stock_name, []).append((yahoo_code, display_name))
 
-    return display_to_ticker, code_to_item, name_to_items
+def resolve_page_data(start: datetime, end: datetime) -> None:
+    # 지표 띠와 종목 검색이 쓰는 데이터를 한 번에 모아 받는다. 각 섹션은 이후 메모리에서 읽는다.
+    jobs = {"market": fetch_market_histories(start, end), "krx": run_blocking(get_krx_index)}
+    with timed_stage("page.resolve"):
+        run_data_tasks(gather_with_progress(jobs, PREFETCH_TIMEOUT_SECONDS, "데이터를 불러오는 중"))
 
 
 def add_target(targets: list[tuple[str, str]], ticker: str, label: str, seen: set[str]) -> bool:
@@ -409,8 +2007,7 @@ def add_target(targets: list[tuple[str, str]], ticker: str, label: str, seen: se
     return True
 
 
-def parse_bulk_input(text: str, stock_dict: dict[str, str], max_items: int = 20):
-    display_to_ticker, code_to_item, name_to_items = build_krx_lookup(stock_dict)
+def parse_bulk_input(text: str, krx_index: KrxSymbolIndex, max_items: int = 20):
     raw_tokens = re.split(r"[\n,;\t]+", text or "")
     targets = []
     failed = []
@@ -427,27 +2024,30 @@ def parse_bulk_input(text: str, stock_dict: dict[str, str], max_items: int = 20)
             failed.append(f"{token} - 최대 {max_items}개 제한")
             continue
 
-        if token in display_to_ticker:
-            add_target(targets, display_to_ticker[token], token, seen)
+        if token in krx_index.display_to_ticker:
+            add_target(targets, krx_index.display_to_ticker[token], token, seen)
             continue
 
         code_match = re.search(r"(?<!\d)(\d{6})(?!\d)", token)
         if code_match:
             stock_code = code_match.group(1)
-            if stock_code in code_to_item:
-                yahoo_code, display_name = code_to_item[stock_code]
+            if stock_code in krx_index.code_to_item:
+                yahoo_code, display_name = krx_index.code_to_item[stock_code]
                 add_target(targets, yahoo_code, display_name, seen)
             else:
                 add_target(targets, stock_code, stock_code, seen)
             continue
 
-        if token in name_to_items:
-            candidates = name_to_items[token]
+        candidates = krx_index.match_name(token)
+        if candidates:
             if len(candidates) == 1:
                 yahoo_code, display_name = candidates[0]
                 add_target(targets, yahoo_code, display_name, seen)
-            else:
+            elif token in krx_index.name_to_items:
                 failed.append(f"{token} - 같은 종목명 후보 {len(candidates)}개")
+            else:
+                preview = ", ".join(display_name for _, display_name in candidates[:3])
+                failed.append(f"{token} - 비슷한 종목 후보 {len(candidates)}개 ({preview})")
             continue
 
         ticker_like = re.fullmatch(r"[A-Za-z0-9\^\.\-=]{1,20}", token)
@@ -460,95 +2060,468 @@ def parse_bulk_input(text: str, stock_dict: dict[str, str], max_items: int = 20)
     return targets, failed
 
 
-def read_uploaded_csv(uploaded_file) -> pd.DataFrame:
+def detect_csv_encoding(raw: bytes) -> str:
+    if raw.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    prefix = raw[:CSV_ENCODING_SNIFF_BYTES]
+    try:
+        # 앞부분만 잘라 보므로 끝에 걸린 멀티바이트 문자는 미완성으로 두고 넘어간다.
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=len(prefix) == len(raw))
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp949"
+
+
+# 파싱 결과는 세션끼리 같은 객체를 공유하므로 호출하는 쪽에서 고치지 않고 복사해서 쓴다.
+@st.cache_resource(max_entries=CSV_CACHE_MAX_ENTRIES, show_spinner=False)
+def _parse_vcp_csv(content_hash: str, _raw: bytes) -> pd.DataFrame:
+    count_event("cache_miss", "csv")
+    with timed_stage("csv.parse"):
+        return _read_vcp_csv(_raw)
+
+
+def _read_vcp_csv(raw: bytes) -> pd.DataFrame:
+    options = {
+        "usecols": lambda column: column in VCP_CSV_COLUMNS,
+        "dtype": {column: str for column in VCP_CSV_TEXT_COLUMNS},
+    }
+    try:
+        frame = pd.read_csv(BytesIO(raw), encoding=detect_csv_encoding(raw), **options)
+    except UnicodeDecodeError:
+        frame = pd.read_csv(BytesIO(raw), encoding="cp949", **options)
+
+    for column in VCP_CSV_NUMERIC_COLUMNS:
+        if column in frame.columns and not pd.api.types.is_numeric_dtype(frame[column]):
+            frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame
+
+
+def read_uploaded_csv(uploaded_file) -> tuple[str, pd.DataFrame]:
     raw = uploaded_file.getvalue()
-    for encoding in ["utf-8-sig", "utf-8", "cp949", "euc-kr"]:
-        try:
-            return pd.read_csv(BytesIO(raw), encoding=encoding)
-        except UnicodeDecodeError:
-            continue
-    return pd.read_csv(BytesIO(raw))
+    content_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    count_event("cache_lookup", "csv")
+    return content_hash, _parse_vcp_csv(content_hash, raw)
+
+
+def normalize_ticker_series(tickers: pd.Series) -> pd.Series:
+    text = tickers.astype(str).str.strip()
+    numeric = text.str.fullmatch(r"\d{1,6}")
+    normalized = text.str.zfill(6).where(numeric, text.str.upper())
+    return normalized.mask(text.eq("") | text.str.lower().eq("nan"), "")
+
+
+@dataclass(frozen=True, eq=False)
+class VcpScreener:
+    frame: pd.DataFrame
+    phases: tuple[str, ...]
+    phase_codes: np.ndarray
+    ranking: np.ndarray
+    # 컬럼별 (값 오름차순 행 번호, 정렬된 값). 값이 없는 행은 빠져 있다.
+    sorted_indexes: dict[str, tuple[np.ndarray, np.ndarray]]
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> VcpScreener:
+        frame = df.reset_index(drop=True)
+        frame = frame.assign(ticker=normalize_ticker_series(frame["ticker"]))
+        phases = pd.Categorical(frame["vcp_phase"].dropna().astype(str).reindex(frame.index))
+
+        numeric = {
+            column: pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64)
+            if column in frame.columns
+            else np.full(len(frame), np.nan)
+            for column in VCP_INDEXED_COLUMNS
+        }
+        sorted_indexes = {}
+        for column, values in numeric.items():
+            order = np.argsort(values, kind="stable")
+            order = order[: np.count_nonzero(~np.isnan(values))]
+            sorted_indexes[column] = order, values[order]
+
+        # 점수, RS 순 내림차순이고 값이 없으면 뒤로 간다. 업로드마다 한 번만 정렬한다.
+        ranking = np.lexsort((-numeric["stockeasy_rs"], -numeric["score"]))
+        return cls(frame, tuple(phases.categories), phases.codes, ranking, sorted_indexes)
+
+    def phase_options(self, prefix: str = "2.") -> list[str]:
+        return [phase for phase in self.phases if phase.startswith(prefix)]
+
+    def value_range(self, column: str) -> tuple[float, float] | None:
+        _, values = self.sorted_indexes[column]
+        if not len(values):
+            return None
+        return float(values[0]), float(values[-1])
+
+    def query(
+        self,
+        phases: Iterable[str],
+        ranges: dict[str, tuple[float | None, float | None]] | None = None,
+        limit: int | None = None,
+    ) -> pd.DataFrame:
+        wanted = np.zeros(len(self.phases) + 1, dtype=bool)
+        phase_positions = {phase: position for position, phase in enumerate(self.phases)}
+        wanted[[phase_positions[phase] for phase in phases if phase in phase_positions]] = True
+        # 값이 없는 단계의 코드 -1은 항상 False인 마지막 칸을 가리킨다.
+        mask = wanted[self.phase_codes]
+
+        for column, (low, high) in (ranges or {}).items():
+            order, values = self.sorted_indexes[column]
+            lo = 0 if low is None else values.searchsorted(low, side="left")
+            hi = len(values) if high is None else values.searchsorted(high, side="right")
+            in_range = np.zeros(len(mask), dtype=bool)
+            in_range[order[lo:hi]] = True
+            mask &= in_range
+
+        rows = self.ranking[np.flatnonzero(mask[self.ranking])[:limit]]
+        return self.frame.iloc[rows]
+
+
+@st.cache_resource(max_entries=CSV_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_vcp_screener(content_hash: str, _frame: pd.DataFrame) -> VcpScreener:
+    with timed_stage("screener.build"):
+        return VcpScreener.build(_frame)
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    # 거래정지일처럼 중간에 빈 날은 직전 값으로 채운다. 상장 이전 구간은 NaN으로 남는다.
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+@dataclass(frozen=True, eq=False)
+class PricePanel:
+    # 날짜 × 종목 배열. 없는 값은 NaN이다.
+    dates: np.ndarray
+    tickers: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_histories(cls, histories: dict[str, PriceSeries], bars: int = VCP_SCAN_BARS) -> PricePanel:
+        items = [(ticker, prices) for ticker, prices in histories.items() if not prices.empty]
+        if not items:
+            empty = np.empty((0, 0), dtype=np.float32)
+            return cls(np.array([], dtype="datetime64[ns]"), np.array([], dtype=str), empty, empty, empty, empty)
+
+        # 모든 종목의 봉을 한 번에 이어 붙인 뒤 (날짜, 종목) 위치에 흩뿌린다.
+        dates, rows = np.unique(np.concatenate([prices.date for _, prices in items]), return_inverse=True)
+        columns = np.repeat(np.arange(len(items)), [len(prices) for _, prices in items])
+        offset = max(len(dates) - bars, 0)
+        keep = rows >= offset
+        rows, columns = rows[keep] - offset, columns[keep]
+
+        def scatter(name: str) -> np.ndarray:
+            values = np.full((len(dates) - offset, len(items)), np.nan, dtype=np.float32)
+            values[rows, columns] = np.concatenate([getattr(prices, name) for _, prices in items])[keep]
+            return values
+
+        def prices_of(name: str) -> np.ndarray:
+            # 거래정지일은 시가·고가·저가가 0으로 들어오므로 빈 날로 보고 직전 값으로 채운다.
+            values = scatter(name)
+            values[values <= 0] = np.nan
+            return _forward_fill(values)
+
+        return cls(
+            dates[offset:],
+            np.array([ticker for ticker, _ in items]),
+            prices_of("high"),
+            prices_of("low"),
+            prices_of("close"),
+            np.nan_to_num(scatter("volume")),
+        )
+
+
+def _vcp_features(panel: PricePanel, columns: np.ndarray) -> dict[str, np.ndarray]:
+    close, high, low, volume = (getattr(panel, name)[:, columns] for name in ("close", "high", "low", "volume"))
+    last = close[-1]
+
+    ma50, ma150, ma200 = (close[-window:].mean(axis=0) for window in (50, 150, 200))
+    ma200_month_ago = close[-220:-20].mean(axis=0)
+    high_52w = np.nanmax(high[-252:], axis=0)
+    low_52w = np.nanmin(low[-252:], axis=0)
+    trend = (
+        (last > ma50)
+        & (ma50 > ma150)
+        & (ma150 > ma200)
+        & (ma200 > ma200_month_ago)
+        & (last >= low_52w * 1.3)
+        & (last >= high_52w * 0.75)
+    )
+
+    base_bars = VCP_BASE_SEGMENTS * VCP_SEGMENT_BARS
+    segments = (VCP_BASE_SEGMENTS, VCP_SEGMENT_BARS, len(last))
+    segment_high = high[-base_bars - VCP_RECENT_BARS : -VCP_RECENT_BARS].reshape(segments).max(axis=1)
+    segment_low = low[-base_bars - VCP_RECENT_BARS : -VCP_RECENT_BARS].reshape(segments).min(axis=1)
+    depth = (1 - segment_low / segment_high) * 100
+    # 마지막 구간부터 거슬러 올라가며 앞 구간보다 얕아진 수축이 몇 번 이어졌는지 센다.
+    shrinking = depth[1:] < depth[:-1]
+    contractions = np.cumprod(shrinking[::-1], axis=0).sum(axis=0) + 1
+    first_depth = np.take_along_axis(depth, (VCP_BASE_SEGMENTS - contractions)[None], axis=0)[0]
+
+    pivot = segment_high[-1]
+    volume_50 = volume[-50:].mean(axis=0)
+    volume_50 = np.where(volume_50 > 0, volume_50, np.nan)
+    return {
+        "trend": trend,
+        "contractions": contractions,
+        "first_depth": first_depth,
+        "final_depth": depth[-1],
+        "pivot": pivot,
+        "distance": (last / pivot - 1) * 100,
+        "dry_up_ratio": volume[-10:].mean(axis=0) / volume_50,
+        "breakout": (last > pivot) & (volume[-1] > volume_50 * VCP_BREAKOUT_VOLUME_RATIO),
+        **{
+            f"return_{days}": last / close[-days - 1] - 1 if len(close) > days else np.full(len(last), np.nan)
+            for days in {21, *VCP_RS_WEIGHTS}
+        },
+    }
+
+
+def _percentile_rank(values: np.ndarray) -> np.ndarray:
+    return (pd.Series(values).rank(pct=True) * 98 + 1).round(1).to_numpy()
+
+
+def detect_vcp(panel: PricePanel, workers: int = VCP_SCAN_WORKERS) -> pd.DataFrame:
+    if len(panel.dates) < VCP_SCAN_MIN_BARS:
+        return pd.DataFrame(columns=VCP_SCAN_COLUMNS)
+
+    # 상장한 지 얼마 안 됐거나 최근 종가가 없는 종목은 추세를 판단할 수 없어 뺀다. 고가·저가는 직전 값으로 채워
+    # 두었으므로 검사 구간 첫날에 값이 있으면 그 뒤로도 모두 있다.
+    eligible = np.flatnonzero(
+        ~np.isnan(panel.close[-VCP_SCAN_MIN_BARS])
+        & ~np.isnan(panel.high[-VCP_SCAN_MIN_BARS])
+        & ~np.isnan(panel.low[-VCP_SCAN_MIN_BARS])
+        & ~np.isnan(panel.close[-1])
+    )
+    if not len(eligible):
+        return pd.DataFrame(columns=VCP_SCAN_COLUMNS)
+    chunks = np.array_split(eligible, -(-len(eligible) // VCP_SCAN_CHUNK))
+    # NumPy 집계는 GIL을 풀므로 종목 묶음을 스레드로 나눠 여러 코어에서 계산한다.
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        parts = list(executor.map(lambda chunk: _vcp_features(panel, chunk), chunks))
+    features = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    returns = np.stack([features[f"return_{days}"] for days in VCP_RS_WEIGHTS])
+    weights = np.array(list(VCP_RS_WEIGHTS.values()))[:, None] * ~np.isnan(returns)
+    weight_sum = weights.sum(axis=0)
+    # 상장 1년이 안 된 종목은 있는 기간의 수익률만으로 가중 평균한다.
+    weighted_return = np.nansum(returns * weights, axis=0) / np.where(weight_sum > 0, weight_sum, np.nan)
+    rs = _percentile_rank(weighted_return)
+
+    trend, contractions = features["trend"], features["contractions"]
+    distance, dry_up_ratio = features["distance"], features["dry_up_ratio"]
+    base = trend & (contractions >= 2)
+    dry_up = dry_up_ratio < VCP_DRY_UP_RATIO
+    near_pivot = (distance >= -VCP_PIVOT_NEAR_PCT) & (distance <= 0)
+    phases = np.select(
+        [~trend, base & features["breakout"], base & dry_up & near_pivot, base & dry_up, base],
+        ["1.0", "3.0", "2.3", "2.2", "2.1"],
+        "1.5",
+    )
+
+    score = (
+        0.4 * np.nan_to_num(rs)
+        + 20 * np.clip((contractions - 1) / (VCP_BASE_SEGMENTS - 1), 0, 1)
+        + 20 * np.clip(1 - np.nan_to_num(dry_up_ratio, nan=1.0), 0, 1)
+        + 20 * np.clip(1 - np.abs(np.nan_to_num(distance, nan=100.0)) / 15, 0, 1)
+    )
+    score = np.where(trend, score, score / 2)
+
+    reasons = (
+        pd.Series(np.where(trend, "추세 충족", "추세 미충족"))
+        + ", 수축 "
+        + pd.Series(contractions).astype(str)
+        + "회 ("
+        + pd.Series(features["first_depth"]).round(0).fillna(0).astype(int).astype(str)
+        + "% → "
+        + pd.Series(features["final_depth"]).round(0).fillna(0).astype(int).astype(str)
+        + "%), 거래량 50일 평균의 "
+        + pd.Series(dry_up_ratio * 100).round(0).fillna(0).astype(int).astype(str)
+        + "%"
+    )
+    return pd.DataFrame(
+        {
+            "ticker": panel.tickers[eligible],
+            "vcp_phase": phases,
+            "vcp_phase_label": pd.Series(phases).map(VCP_PHASE_LABELS).to_numpy(),
+            "pivot_price": features["pivot"].astype(np.float64).round(2),
+            "pivot_distance_pct": distance.astype(np.float64).round(2),
+            "score": score.astype(np.float64).round(1),
+            # CSV의 stockeasy_rs 자리에 같은 방식(3·6·9·12개월 가중 수익률 백분위)으로 계산한 값을 넣는다.
+            "stockeasy_rs": rs,
+            "rs_1m": _percentile_rank(features["return_21"]),
+            "rs_3m": _percentile_rank(features["return_63"]),
+            "rs_6m": _percentile_rank(features["return_126"]),
+            "reasons": reasons.to_numpy(),
+        }
+    )
+
+
+def scan_krx_vcp(
+    as_of: date, timeout: float | None = VCP_SCAN_TIMEOUT_SECONDS, progress_label: str | None = None
+) -> pd.DataFrame:
+    krx_index = get_krx_index()
+    start, end = page_datetime_range(as_of - timedelta(days=VCP_SCAN_HISTORY_DAYS), as_of)
+    histories = prefetch_stock_histories(
+        list(krx_index.code_to_item), start, end, timeout=timeout, progress_label=progress_label
+    )
+    with timed_stage("vcp.detect"):
+        result = detect_vcp(PricePanel.from_histories(histories))
 
+    names = pd.Series({code: display for code, (_, display) in krx_index.code_to_item.items()})
+    names = names.str.replace(r" \(\d{6}\)$", "", regex=True)
+    result.insert(1, "name", result["ticker"].map(names).fillna(result["ticker"]))
+    return result
 
-def filter_vcp_phase_2(df: pd.DataFrame, selected_phases: Iterable[str]) -> pd.DataFrame:
-    frame = df.copy()
-    frame["ticker"] = frame["ticker"].map(normalize_ticker)
-    frame["vcp_phase"] = frame["vcp_phase"].astype(str)
-    frame["score"] = pd.to_numeric(frame.get("score"), errors="coerce")
-    frame["stockeasy_rs"] = pd.to_numeric(frame.get("stockeasy_rs"), errors="coerce")
-    phase_mask = frame["vcp_phase"].isin(selected_phases)
-    return frame[phase_mask].sort_values(["score", "stockeasy_rs"], ascending=False, na_position="last")
 
+@st.cache_resource(show_spinner=False)
+def _vcp_scan_results() -> dict[str, tuple[str, pd.DataFrame]]:
+    return {}
 
-def render_metric_chart(name: str, symbol: str, provider: str, start: datetime, end: datetime):
-    data = get_market_history(symbol, provider, start, end)
-    cache_key = f"last_market_{symbol}"
 
-    if data.empty and cache_key in st.session_state:
-        data = st.session_state[cache_key]
-        st.caption("이번 로드는 실패해 현재 세션의 마지막 성공 데이터를 표시합니다.")
-    elif not data.empty:
-        st.session_state[cache_key] = data
+def page_datetime_range(start_date: date, end_date: date) -> tuple[datetime, datetime]:
+    # 종료일 당일 봉까지 포함하도록 다음 날 0시를 끝으로 잡는다.
+    return datetime.combine(start_date, datetime.min.time()), datetime.combine(
+        end_date + timedelta(days=1), datetime.min.time()
+    )
+
+
+def render_chart(fig: go.Figure):
+    # Figure를 JSON으로 바꿔 브라우저로 보내는 시간도 따로 잰다.
+    with timed_stage("chart.serialize"):
+        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
 
+
+def render_metric_chart(name: str, symbol: str, provider: str, data: PriceSeries):
     if data.empty:
         st.error(f"{name} 데이터 로드 실패")
+        reason = describe_fetch_failure([(provider, symbol)])
+        if reason:
+            st.caption(reason)
         return
 
-    close = data["close"].dropna()
+    close = data.close
     if len(close) < 2:
         st.warning(f"{name} 비교 가능한 데이터가 부족합니다.")
         return
 
-    last_price = to_float(close.iloc[-1], 0) or 0
-    prev_price = to_float(close.iloc[-2], last_price) or last_price
+    last_price = to_float(close[-1], 0) or 0
+    prev_price = to_float(close[-2], last_price) or last_price
     delta = last_price - prev_price
     delta_pct = (delta / prev_price) * 100 if prev_price else 0
 
     st.metric(name, f"{last_price:,.2f}", f"{delta:,.2f} ({delta_pct:.2f}%)")
-    st.plotly_chart(make_line_chart(data, name), use_container_width=True, config={"displayModeBar": False})
-
-
-st.title("경제 대시보드 + VCP 후보 차트")
+    render_chart(memoized_chart("line", data, title=name))
+    if _background_refresher().is_refreshing(provider, symbol):
+        st.caption("마지막으로 받은 데이터입니다. 새 데이터를 받는 중입니다.")
+    elif _negative_cache_remaining(provider, symbol) > 0:
+        st.caption("최근 갱신에 실패해 마지막으로 받은 데이터를 표시합니다.")
+
+
+def paginate(items: list, per_page: int, key: str) -> list:
+    page_count = max(1, -(-len(items) // per_page))
+    if page_count == 1:
+        return items
+    page = st.radio("페이지", list(range(1, page_count + 1)), horizontal=True, key=key)
+    first = (page - 1) * per_page
+    st.caption(f"{len(items)}개 중 {first + 1}-{min(first + per_page, len(items))}번째")
+    return items[first : first + per_page]
+
+
+def render_market_strip(start: datetime, end: datetime, live_interval: int | None = None):
+    # 실시간 갱신 중에는 주기마다 마지막 봉부터만 백그라운드에서 받고, 받은 값은 다음 주기에 반영된다. 값이 그대로인
+    # 지표는 Figure 캐시를 그대로 쓰므로 새로 그려지는 것은 바뀐 지표뿐이다.
+    histories = get_market_histories(start, end, live_interval or PRICE_STORE_REFRESH_SECONDS)
+    st.subheader("주요 경제지표")
+    if live_interval:
+        st.caption(f"{datetime.now():%H:%M:%S} 기준, {live_interval}초마다 갱신합니다.")
+    market_cols = st.columns(3)
+    for i, item in enumerate(MARKET_TICKERS):
+        with market_cols[i % 3]:
+            data = histories.get(item["symbol"], EMPTY_PRICES)
+            render_metric_chart(item["name"], item["symbol"], item["provider"], data)
+
+
+def render_vcp_candidate(selected: pd.Series, chart_data: PriceSeries, chart_period: str):
+    chart_title = f"{selected['name']} ({selected['ticker']})"
+    pivot_price = to_float(selected.get("pivot_price"))
+    pivot_distance_pct = to_float(selected.get("pivot_distance_pct"))
+    phase_label = str(selected.get("vcp_phase_label", ""))
+
+    st.markdown(f"**{chart_title}**")
+    metric_cols = st.columns(2)
+    metric_cols[0].metric("총점", f"{to_float(selected.get('score'), 0):.1f}")
+    metric_cols[1].metric("RS", f"{to_float(selected.get('stockeasy_rs'), 0):.1f}")
+
+    if chart_data.empty:
+        st.warning("가격 데이터를 불러오지 못했습니다.")
+        reason = describe_fetch_failure(stock_history_sources(selected["ticker"]))
+        if reason:
+            st.caption(reason)
+        return
 
-link_col1, link_col2 = st.columns(2)
-with link_col1:
-    st.link_button(
-        "OECD 경기선행지수 보기",
-        "https://www.oecd.org/en/data/indicators/composite-leading-indicator-cli.html",
-    )
-with link_col2:
-    st.link_button(
-        "관세청 수출입 무역통계 보기",
-        "https://unipass.customs.go.kr/ets/",
+    if chart_period == "주봉":
+        display_title = chart_title + " 주봉"
+        volume_title = "주간 거래량"
+        ma_windows = (10, 30)
+    elif chart_period == "월봉":
+        display_title = chart_title + " 월봉"
+        volume_title = "월간 거래량"
+        ma_windows = (6, 12)
+    else:
+        display_title = chart_title
+        volume_title = "거래량"
+        ma_windows = (20, 50)
+
+    render_chart(
+        memoized_chart(
+            "price_volume",
+            chart_data,
+            title=display_title,
+            volume_title=volume_title,
+            moving_average_windows=ma_windows,
+            pivot_price=pivot_price,
+            pivot_distance_pct=pivot_distance_pct,
+            vcp_phase_label=phase_label,
+            chart_height=540,
+            target_width_px=480,
+        )
     )
 
-with st.sidebar:
-    st.header("설정")
-    default_start = datetime.now() - timedelta(days=365)
-    default_end = datetime.now()
-    start_date = st.date_input("시작일", default_start)
-    end_date = st.date_input("종료일", default_end)
-    st.markdown("---")
-    st.caption("주요 지표는 30분 캐시와 간단한 재시도를 적용합니다.")
+    if pivot_price is not None or pivot_distance_pct is not None:
+        pivot_text = f"Pivot {pivot_price:,.0f}" if pivot_price is not None else "Pivot -"
+        distance_text = f" / 거리 {pivot_distance_pct:+.1f}%" if pivot_distance_pct is not None else ""
+        st.caption(pivot_text + distance_text)
 
-if start_date >= end_date:
-    st.error("시작일은 종료일보다 앞선 날짜여야 합니다.")
-    st.stop()
+    if "vcp_watch_point" in selected and pd.notna(selected.get("vcp_watch_point")):
+        st.caption(f"관찰: {selected.get('vcp_watch_point')}")
 
-start_dt = datetime.combine(start_date, datetime.min.time())
-end_dt = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
 
-st.subheader("주요 경제지표")
-market_cols = st.columns(3)
-for i, item in enumerate(MARKET_TICKERS):
-    with market_cols[i % 3]:
-        render_metric_chart(item["name"], item["symbol"], item["provider"], start_dt, end_dt)
+@st.fragment
+def render_vcp_chart_grid(vcp_df: pd.DataFrame, start: datetime, end: datetime):
+    # 차트 주기나 페이지를 바꾸면 이 격자만 다시 그린다.
+    st.markdown("### VCP 후보 차트")
+    chart_period = st.radio("차트 주기", list(BAR_TIMEFRAMES), horizontal=True)
+    page_items = paginate([row for _, row in vcp_df.iterrows()], VCP_CHARTS_PER_PAGE, "vcp_chart_page")
 
-st.markdown("---")
+    vcp_histories = prefetch_stock_histories(
+        [row["ticker"] for row in page_items],
+        start,
+        end,
+        chart_period,
+        progress_label=f"후보 {len(page_items)}개 종목의 가격 데이터를 불러오는 중",
+    )
+
+    for row_start in range(0, len(page_items), 3):
+        chart_cols = st.columns(3)
+        for col_index, selected in enumerate(page_items[row_start : row_start + 3]):
+            with chart_cols[col_index]:
+                chart_data = vcp_histories.get(normalize_ticker(selected["ticker"]), EMPTY_PRICES)
+                render_vcp_candidate(selected, chart_data, chart_period)
 
-tab_vcp, tab_manual = st.tabs(["VCP CSV 차트", "관심 종목"])
 
-with tab_vcp:
+def load_uploaded_vcp() -> tuple[str, pd.DataFrame] | None:
     st.subheader("Stock Trend Radar CSV 업로드")
     uploaded_file = st.file_uploader(
         "CSV 파일을 업로드하면 VCP 2번대 종목을 필터링하고 프로젝트와 같은 캔들+거래량 차트를 생성합니다.",
@@ -557,125 +2530,114 @@ with tab_vcp:
 
     if uploaded_file is None:
         st.info("Stock Trend Radar에서 내려받은 CSV 파일을 업로드하세요.")
-    else:
-        try:
-            uploaded_df = read_uploaded_csv(uploaded_file)
-        except Exception as exc:
-            st.error(f"CSV를 읽지 못했습니다: {exc}")
-            st.stop()
-
-        missing = sorted(REQUIRED_VCP_COLUMNS - set(uploaded_df.columns))
-        if missing:
-            st.error("CSV에 필요한 컬럼이 없습니다: " + ", ".join(missing))
-            st.stop()
-
-        phase_options = sorted(
-            [phase for phase in uploaded_df["vcp_phase"].dropna().astype(str).unique() if phase.startswith("2.")]
+        return None
+
+    try:
+        return read_uploaded_csv(uploaded_file)
+    except Exception as exc:
+        st.error(f"CSV를 읽지 못했습니다: {exc}")
+        return None
+
+
+def load_scanned_vcp(as_of: date) -> tuple[str, pd.DataFrame] | None:
+    st.subheader("KRX 전 종목 VCP 계산")
+    scans = _vcp_scan_results()
+    key = as_of.isoformat()
+    if key not in scans:
+        st.info(
+            f"{key}까지의 가격으로 KRX 전 종목의 VCP 단계를 직접 계산합니다. "
+            "가격 저장소가 비어 있으면 처음 한 번은 오래 걸립니다."
         )
-        if not phase_options:
-            st.warning("이 CSV에는 vcp_phase가 2번대로 시작하는 종목이 없습니다.")
-            st.stop()
-
-        left, middle, right = st.columns([2, 1, 1])
-        with left:
-            selected_phases = st.multiselect("표시할 VCP 단계", phase_options, default=phase_options)
-        with middle:
-            max_rows = st.slider("차트 표시 종목 수", 3, 60, 12, 3)
-        with right:
-            chart_period = st.radio("차트 주기", ["일봉", "주봉"], horizontal=True)
-
-        vcp_df = filter_vcp_phase_2(uploaded_df, selected_phases).head(max_rows)
-        if vcp_df.empty:
-            st.warning("선택한 VCP 단계에 해당하는 종목이 없습니다.")
-            st.stop()
-
-        display_cols = [
-            col
-            for col in [
-                "name",
-                "ticker",
-                "score",
-                "stockeasy_rs",
-                "rs_1m",
-                "rs_3m",
-                "rs_6m",
-                "vcp_phase",
-                "vcp_phase_label",
-                "pivot_price",
-                "pivot_distance_pct",
-                "pivot_timing_label",
-                "reasons",
-            ]
-            if col in vcp_df.columns
+        if not st.button("전 종목 계산 시작"):
+            return None
+        result = scan_krx_vcp(as_of, progress_label="KRX 종목 가격을 불러오는 중")
+        # 결과는 모든 세션이 같이 쓰고, 다른 기준일 결과는 버린다.
+        scans.clear()
+        scans[key] = f"scan-{key}-{time.time_ns()}", result
+
+    content_hash, result = scans[key]
+    st.caption(f"{key} 기준 {len(result):,}개 종목을 계산했습니다.")
+    if st.button("다시 계산"):
+        scans.pop(key, None)
+        st.rerun(scope="fragment")
+    return content_hash, result
+
+
+@st.fragment
+def render_vcp_tab(start: datetime, end: datetime):
+    source = st.radio("후보 출처", VCP_SOURCES, horizontal=True, key="vcp_source")
+    if source == VCP_SOURCES[0]:
+        loaded = load_uploaded_vcp()
+    else:
+        loaded = load_scanned_vcp((end - timedelta(days=1)).date())
+    if loaded is None:
+        return
+
+    content_hash, candidates = loaded
+    missing = sorted(REQUIRED_VCP_COLUMNS - set(candidates.columns))
+    if missing:
+        st.error("CSV에 필요한 컬럼이 없습니다: " + ", ".join(missing))
+        return
+
+    screener = get_vcp_screener(content_hash, candidates)
+    phase_options = screener.phase_options("2.")
+    if not phase_options:
+        st.warning("vcp_phase가 2번대로 시작하는 종목이 없습니다.")
+        return
+
+    left, right = st.columns([2, 1])
+    with left:
+        selected_phases = st.multiselect("표시할 VCP 단계", phase_options, default=phase_options)
+    with right:
+        max_rows = st.slider("차트 표시 종목 수", 3, 60, 12, 3)
+
+    ranges = {}
+    with st.expander("추가 필터"):
+        for column, label in VCP_RANGE_FILTERS.items():
+            bounds = screener.value_range(column)
+            if bounds is None or bounds[0] == bounds[1]:
+                continue
+            picked = st.slider(label, bounds[0], bounds[1], bounds)
+            if picked != bounds:
+                ranges[column] = picked
+
+    with timed_stage("screener.query"):
+        vcp_df = screener.query(selected_phases, ranges, limit=max_rows)
+    if vcp_df.empty:
+        st.warning("선택한 VCP 단계에 해당하는 종목이 없습니다.")
+        return
+
+    display_cols = [
+        col
+        for col in [
+            "name",
+            "ticker",
+            "score",
+            "stockeasy_rs",
+            "rs_1m",
+            "rs_3m",
+            "rs_6m",
+            "vcp_phase",
+            "vcp_phase_label",
+            "pivot_price",
+            "pivot_distance_pct",
+            "pivot_timing_label",
+            "reasons",
         ]
-        st.dataframe(vcp_df[display_cols], use_container_width=True, hide_index=True)
-
-        st.markdown("### VCP 후보 차트")
-        chart_items = list(vcp_df.iterrows())
-        for row_start in range(0, len(chart_items), 3):
-            chart_cols = st.columns(3)
-            for col_index, (_, selected) in enumerate(chart_items[row_start : row_start + 3]):
-                with chart_cols[col_index]:
-                    chart_title = f"{selected['name']} ({selected['ticker']})"
-                    pivot_price = to_float(selected.get("pivot_price"))
-                    pivot_distance_pct = to_float(selected.get("pivot_distance_pct"))
-                    phase_label = str(selected.get("vcp_phase_label", ""))
-
-                    st.markdown(f"**{chart_title}**")
-                    metric_cols = st.columns(2)
-                    metric_cols[0].metric("총점", f"{to_float(selected.get('score'), 0):.1f}")
-                    metric_cols[1].metric("RS", f"{to_float(selected.get('stockeasy_rs'), 0):.1f}")
-
-                    chart_data = get_stock_history(selected["ticker"], start_dt, end_dt)
-                    if chart_data.empty:
-                        st.warning("가격 데이터를 불러오지 못했습니다.")
-                        continue
-
-                    if chart_period == "주봉":
-                        display_data = resample_weekly(chart_data)
-                        display_title = chart_title + " 주봉"
-                        volume_title = "주간 거래량"
-                        ma_windows = (10, 30)
-                    else:
-                        display_data = chart_data
-                        display_title = chart_title
-                        volume_title = "거래량"
-                        ma_windows = (20, 50)
-
-                    if display_data.empty:
-                        st.warning(f"{chart_period} 데이터를 만들지 못했습니다.")
-                        continue
-
-                    st.plotly_chart(
-                        make_price_volume_chart(
-                            display_data,
-                            display_title,
-                            volume_title,
-                            moving_average_windows=ma_windows,
-                            pivot_price=pivot_price,
-                            pivot_distance_pct=pivot_distance_pct,
-                            vcp_phase_label=phase_label,
-                            chart_height=540,
-                        ),
-                        use_container_width=True,
-                        config={"displayModeBar": False},
-                    )
-
-                    if pivot_price is not None or pivot_distance_pct is not None:
-                        pivot_text = f"Pivot {pivot_price:,.0f}" if pivot_price is not None else "Pivot -"
-                        distance_text = f" / 거리 {pivot_distance_pct:+.1f}%" if pivot_distance_pct is not None else ""
-                        st.caption(pivot_text + distance_text)
-
-                    if "vcp_watch_point" in selected and pd.notna(selected.get("vcp_watch_point")):
-                        st.caption(f"관찰: {selected.get('vcp_watch_point')}")
-
-with tab_manual:
+        if col in vcp_df.columns
+    ]
+    st.dataframe(vcp_df[display_cols], use_container_width=True, hide_index=True)
+    render_vcp_chart_grid(vcp_df, start, end)
+
+
+@st.fragment
+def render_watchlist(start: datetime, end: datetime):
     st.subheader("관심 종목 상세 분석")
-    krx_stock_dict = get_krx_dict()
+    krx_index = get_krx_index()
 
     col_search1, col_search2 = st.columns(2)
     with col_search1:
-        selected_korea = st.multiselect("한국 주식", list(krx_stock_dict.keys()))
+        selected_korea = st.multiselect("한국 주식", krx_index.displays)
     with col_search2:
         manual_input = st.text_input("해외 티커 또는 6자리 종목코드", placeholder="AAPL, TSLA, 005930")
 
@@ -691,7 +2653,7 @@ with tab_manual:
             submitted = st.form_submit_button("입력 적용")
 
         if submitted:
-            bulk_targets, bulk_failed = parse_bulk_input(bulk_input, krx_stock_dict, max_items=20)
+            bulk_targets, bulk_failed = parse_bulk_input(bulk_input, krx_index, max_items=20)
             st.session_state["bulk_input"] = bulk_input
             st.session_state["bulk_targets"] = bulk_targets
             st.session_state["bulk_failed"] = bulk_failed
@@ -706,13 +2668,13 @@ with tab_manual:
             st.session_state["bulk_targets"] = []
             st.session_state["bulk_failed"] = []
             st.session_state["bulk_input"] = ""
-            st.rerun()
+            st.rerun(scope="fragment")
 
     analysis_targets = []
     seen_tickers = set()
 
     for item in selected_korea:
-        add_target(analysis_targets, krx_stock_dict[item], item, seen_tickers)
+        add_target(analysis_targets, krx_index.display_to_ticker[item], item, seen_tickers)
 
     if manual_input:
         for code in re.split(r"[,;\n\t]+", manual_input):
@@ -723,23 +2685,171 @@ with tab_manual:
     for ticker, label in st.session_state.get("bulk_targets", []):
         add_target(analysis_targets, ticker, label, seen_tickers)
 
-    if analysis_targets:
-        st.info(f"총 {len(analysis_targets)}개 종목의 차트를 표시합니다.")
-        chart_cols = st.columns(2)
-        for i, (code, display_name) in enumerate(analysis_targets):
-            with chart_cols[i % 2]:
-                with st.spinner(f"{display_name} 데이터를 불러오는 중..."):
-                    df = get_stock_history(code, start_dt, end_dt)
-                if not df.empty:
-                    st.plotly_chart(
-                        make_price_volume_chart(df, display_name, "거래량"),
-                        use_container_width=True,
-                        config={"displayModeBar": False},
-                    )
-                else:
-                    st.warning(f"{display_name} 데이터가 없습니다. 종목코드 또는 티커를 확인하세요.")
-    else:
+    if not analysis_targets:
         st.info("종목을 선택하거나 입력하면 차트가 표시됩니다.")
+        return
+
+    st.info(f"총 {len(analysis_targets)}개 종목의 차트를 표시합니다.")
+    page_targets = paginate(analysis_targets, WATCHLIST_CHARTS_PER_PAGE, "watchlist_chart_page")
+    target_histories = prefetch_stock_histories(
+        [code for code, _ in page_targets],
+        start,
+        end,
+        progress_label=f"{len(page_targets)}개 종목 데이터를 불러오는 중",
+    )
+
+    chart_cols = st.columns(2)
+    for i, (code, display_name) in enumerate(page_targets):
+        with chart_cols[i % 2]:
+            df = target_histories.get(normalize_ticker(code), EMPTY_PRICES)
+            if not df.empty:
+                render_chart(memoized_chart("price_volume", df, title=display_name, volume_title="거래량"))
+            else:
+                st.warning(f"{display_name} 데이터가 없습니다. 종목코드 또는 티커를 확인하세요.")
+                reason = describe_fetch_failure(stock_history_sources(code))
+                if reason:
+                    st.caption(reason)
+
+
+def render_diagnostics():
+    snapshot = metrics_snapshot()
+    st.caption(f"{snapshot['started_at'].replace('T', ' ')} 이후 이 서버 프로세스의 기록입니다.")
+    memory = snapshot["price_memory"]
+    st.caption(
+        f"가격 메모리: {memory['entries']:,}개 종목, {memory['bytes'] / 2**20:.1f}/"
+        f"{memory['budget_bytes'] / 2**20:.0f} MB, 내린 종목 {memory['evictions']:,}개"
+    )
+    in_flight = snapshot["in_flight"]
+    st.caption(f"지금 받는 중인 종목 {in_flight['fetches']}개, 백그라운드 갱신 대기 {in_flight['revalidating']}개")
+
+    stages = pd.DataFrame(
+        [
+            {
+                "단계": stage,
+                "호출": stats["count"],
+                "합계(초)": stats["total_seconds"],
+                "p50(ms)": stats["p50_seconds"] * 1000,
+                "p95(ms)": stats["p95_seconds"] * 1000,
+                "최대(ms)": stats["max_seconds"] * 1000,
+            }
+            for stage, stats in snapshot["stages"].items()
+        ]
+    )
+    if not stages.empty:
+        st.dataframe(
+            stages.sort_values("합계(초)", ascending=False).round(2), use_container_width=True, hide_index=True
+        )
+
+    for cache, stats in snapshot["caches"].items():
+        if stats["hit_ratio"] is not None:
+            hits = stats["lookups"] - stats["misses"]
+            st.caption(f"캐시 {cache}: 적중 {stats['hit_ratio']:.0%} ({hits}/{stats['lookups']})")
+    for item in snapshot["events"]:
+        st.caption(f"{item['event']} {item['label']}: {item['count']}회")
+
+    if snapshot["symbols"]:
+        symbols = pd.DataFrame(snapshot["symbols"]).sort_values("bytes", ascending=False)
+        symbols["KB"] = symbols["bytes"] / 1024
+        st.dataframe(
+            symbols[["provider", "symbol", "fetches", "KB"]].head(20).round(1),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    json_col, prom_col = st.columns(2)
+    json_col.download_button(
+        "JSON",
+        json.dumps(snapshot, ensure_ascii=False, indent=2),
+        file_name="metrics.json",
+        mime="application/json",
+    )
+    prom_col.download_button("Prometheus", metrics_prometheus(snapshot), file_name="metrics.prom", mime="text/plain")
+    if st.button("진단 기록 지우기"):
+        _stage_metrics().reset()
+        _price_memory().reset_stats()
+        st.rerun()
+
+
+def main():
+    page_started = time.perf_counter()
+    st.set_page_config(page_title="경제 대시보드 + VCP 차트", layout="wide")
+    st.title("경제 대시보드 + VCP 후보 차트")
+
+    link_col1, link_col2 = st.columns(2)
+    with link_col1:
+        st.link_button(
+            "OECD 경기선행지수 보기",
+            "https://www.oecd.org/en/data/indicators/composite-leading-indicator-cli.html",
+        )
+    with link_col2:
+        st.link_button(
+            "관세청 수출입 무역통계 보기",
+            "https://unipass.customs.go.kr/ets/",
+        )
+
+    with st.sidebar:
+        st.header("설정")
+        default_start = datetime.now() - timedelta(days=DEFAULT_HISTORY_DAYS)
+        default_end = datetime.now()
+        start_date = st.date_input("시작일", default_start, key="start_date")
+        end_date = st.date_input("종료일", default_end, key="end_date")
+        live_market = st.toggle("주요 지표 실시간 갱신", key="live_market")
+        live_label = st.selectbox("갱신 주기", list(MARKET_LIVE_INTERVALS), index=1, disabled=not live_market)
+        live_interval = MARKET_LIVE_INTERVALS[live_label] if live_market else None
+        st.markdown("---")
+        st.caption("주요 지표는 30분마다, 실시간 갱신을 켜면 정한 주기마다 마지막 봉만 새로 받습니다.")
+        st.caption("가격 데이터는 로컬 저장소에 보관하고 빠진 구간만 새로 받습니다.")
+
+    if start_date >= end_date:
+        st.error("시작일은 종료일보다 앞선 날짜여야 합니다.")
+        st.stop()
+
+    start_dt, end_dt = page_datetime_range(start_date, end_date)
+
+    resolve_page_data(start_dt, end_dt)
+    st.fragment(render_market_strip, run_every=live_interval)(start_dt, end_dt, live_interval)
+
+    st.markdown("---")
+
+    tab_vcp, tab_manual = st.tabs(["VCP CSV 차트", "관심 종목"])
+
+    with tab_vcp:
+        render_vcp_tab(start_dt, end_dt)
+
+    with tab_manual:
+        render_watchlist(start_dt, end_dt)
+
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("데이터 소스 상태")
+        for provider, label in PROVIDER_LABELS.items():
+            breaker = _provider_breakers()[provider]
+            if breaker.is_open():
+                st.warning(
+                    f"{label}: 연속 {breaker.failures}회 실패로 일시 중단 "
+                    f"(약 {breaker.seconds_until_retry():.0f}초 후 재시도)"
+                )
+            else:
+                st.caption(f"{label}: 정상")
+
+        failed_symbols = negative_cache_snapshot()
+        if failed_symbols:
+            st.caption(
+                f"최근 조회 실패 {len(failed_symbols)}건은 {NEGATIVE_CACHE_TTL_SECONDS // 60}분 동안 다시 요청하지 않습니다: "
+                + ", ".join(symbol for _, symbol, _ in failed_symbols[:10])
+            )
+        if (failed_symbols or any(b.is_open() for b in _provider_breakers().values())) and st.button("실패 기록 지우기"):
+            clear_fetch_failures()
+            st.rerun()
+
+        _stage_metrics().observe("page.render", time.perf_counter() - page_started)
+        if st.toggle("진단 정보 표시", key="show_diagnostics"):
+            render_diagnostics()
+
+    st.markdown("---")
+    st.caption("본 대시보드는 참고용 정보 제공 도구이며, 투자 권유 또는 매매 추천이 아닙니다.")
+    export_metrics()
+
 
-st.markdown("---")
-st.caption("본 대시보드는 참고용 정보 제공 도구이며, 투자 권유 또는 매매 추천이 아닙니다.")
+if __name__ == "__main__":
+    main()
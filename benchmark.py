@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import base64
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable
+
+# app을 불러오기 전에 캐시 위치를 임시 폴더로 돌려 실제 저장소를 건드리지 않는다.
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="dashboard-bench-"))
+os.environ["DASHBOARD_CACHE_DIR"] = str(BENCH_DIR / "cache")
+os.environ["PRICE_STORE_DIR"] = str(BENCH_DIR / "ohlcv-micro")
+# 끝나면 벤치마크가 만든 저장소를 지운다. 들여다봐야 하면 --keep으로 남긴다.
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+# 스크립트 실행 맥락 밖에서 부르는 경고가 결과 표를 덮지 않게 한다.
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import FinanceDataReader as fdr
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+import yfinance as yf
+
+import app
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+RANGE_DAYS = {"1y": 365, "5y": 365 * 5, "20y": 365 * 20}
+DEFAULT_TICKER_COUNTS = "10,60,500"
+# VCP 탭 한 페이지에 그리는 차트 수 기준으로 한 번 재실행에 보내는 양을 계산한다.
+CHART_GRID_SIZE = 60
+CHART_PAYLOAD_CASES = {
+    "grid": ("price_volume", {"chart_height": 540, "target_width_px": 480}),
+    "full": ("price_volume", {"target_width_px": None}),
+    "line": ("line", {}),
+}
+FAKE_HISTORY_START = pd.Timestamp("2000-01-03")
+FAKE_LISTING_SIZE = 2700
+
+
+class FakeProviders:
+    # 종목별 시드로 만든 고정 시계열을 돌려주므로 같은 구간은 몇 번을 받아도 값이 같다.
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 7):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.calls = {"fdr": 0, "yf": 0, "listing": 0}
+        self._attempts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        fdr.DataReader = self.data_reader
+        fdr.StockListing = self.stock_listing
+        yf.download = self.download
+
+    def _call(self, provider: str, key: str) -> None:
+        with self._lock:
+            self.calls[provider] += 1
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        time.sleep(self.latency)
+        if random.Random(zlib.crc32(f"{self.seed}|{key}|{attempt}".encode())).random() < self.failure_rate:
+            raise ConnectionError(f"fake {provider} failure for {key}")
+
+    @lru_cache(maxsize=4096)
+    def _full_history(self, symbol: str) -> pd.DataFrame:
+        dates = pd.bdate_range(FAKE_HISTORY_START, pd.Timestamp.today().normalize(), name="Date")
+        rng = np.random.default_rng(zlib.crc32(f"{self.seed}|{symbol}".encode()))
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        spread = close * rng.uniform(0.002, 0.03, len(dates))
+        open_ = close + rng.uniform(-1, 1, len(dates)) * spread
+        return pd.DataFrame(
+            {
+                "Open": open_,
+                "High": np.maximum(open_, close) + spread,
+                "Low": np.minimum(open_, close) - spread,
+                "Close": close,
+                "Adj Close": close,
+                "Volume": rng.integers(10_000, 5_000_000, len(dates)),
+            },
+            index=dates,
+        )
+
+    def warm(self, symbols: Iterable[str]) -> None:
+        # 가짜 시계열 생성 비용이 첫 측정에 섞이지 않게 미리 만들어 둔다.
+        for symbol in symbols:
+            self._full_history(str(symbol))
+
+    def history(self, symbol: str, start, end) -> pd.DataFrame:
+        frame = self._full_history(str(symbol))
+        lo = frame.index.searchsorted(pd.Timestamp(start))
+        hi = frame.index.searchsorted(pd.Timestamp(end))
+        return frame.iloc[lo:hi].copy()
+
+    def data_reader(self, symbol, start=None, end=None, *args, **kwargs) -> pd.DataFrame:
+        self._call("fdr", f"fdr:{symbol}")
+        return self.history(symbol, start, end).drop(columns="Adj Close")
+
+    def download(self, tickers, start=None, end=None, group_by=None, **kwargs) -> pd.DataFrame:
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        self._call("yf", "yf:" + ",".join(symbols))
+        frames = {symbol: self.history(symbol, start, end) for symbol in symbols}
+        combined = pd.concat(frames, axis=1)
+        if group_by != "ticker":
+            combined = combined.swaplevel(0, 1, axis=1)
+        return combined
+
+    def stock_listing(self, market: str = "KRX") -> pd.DataFrame:
+        self._call("listing", f"listing:{market}")
+        return fake_listing(self.seed)
+
+
+@lru_cache(maxsize=4)
+def fake_listing(seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    syllables = [chr(code) for code in range(0xAC00, 0xD7A4, 37)]
+    names = ["".join(rng.choice(syllables, rng.integers(2, 6))) for _ in range(FAKE_LISTING_SIZE)]
+    return pd.DataFrame(
+        {
+            "Code": [f"{100000 + index * 7:06d}" for index in range(FAKE_LISTING_SIZE)],
+            "Name": names,
+            "Market": rng.choice(["KOSPI", "KOSDAQ", "KOSDAQ GLOBAL"], FAKE_LISTING_SIZE),
+        }
+    )
+
+
+def fake_vcp_csv(count: int, seed: int = 7) -> bytes:
+    rng = np.random.default_rng(seed)
+    listing = fake_listing(seed).sample(count, replace=count > FAKE_LISTING_SIZE, random_state=seed)
+    frame = pd.DataFrame(
+        {
+            "ticker": listing["Code"].to_numpy(),
+            "name": listing["Name"].to_numpy(),
+            "vcp_phase": rng.choice(["2.1", "2.2", "2.3", "3.1"], count),
+            "vcp_phase_label": "수축 진행",
+            "pivot_price": rng.uniform(5_000, 200_000, count).round(0),
+            "pivot_distance_pct": rng.normal(-5, 8, count).round(2),
+            "score": rng.uniform(0, 100, count).round(1),
+            "stockeasy_rs": rng.uniform(0, 100, count).round(1),
+            "rs_1m": rng.uniform(0, 100, count).round(1),
+            "rs_3m": rng.uniform(0, 100, count).round(1),
+            "rs_6m": rng.uniform(0, 100, count).round(1),
+            "reasons": "거래량 감소, 변동성 축소",
+        }
+    )
+    return frame.to_csv(index=False).encode("utf-8-sig")
+
+
+class FakeUpload:
+    def __init__(self, raw: bytes, name: str = "vcp.csv"):
+        self.raw = raw
+        self.name = name
+
+    def getvalue(self) -> bytes:
+        return self.raw
+
+
+def clear_caches(store_dir: Path) -> None:
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    app.KRX_LISTING_PATH.unlink(missing_ok=True)
+    app.PRICE_STORE_DIR = store_dir
+    os.environ["PRICE_STORE_DIR"] = str(store_dir)
+
+
+def peak_rss_mb() -> float:
+    # 리눅스는 KB, macOS는 바이트 단위로 돌려준다.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def summarize(name: str, durations: list[float], items: int = 1, peak_bytes: int | None = None, **extra) -> dict:
+    values = np.asarray(durations) * 1000
+    return {
+        "name": name,
+        "calls": len(durations),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "throughput_per_s": items * len(durations) / max(sum(durations), 1e-9),
+        "peak_mb": None if peak_bytes is None else peak_bytes / 2**20,
+        **extra,
+    }
+
+
+def measure(name: str, func, repeat: int, items: int = 1, **extra) -> dict:
+    func()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+
+    # tracemalloc은 느려서 시간 측정과 따로 한 번 더 돌려 최대 메모리만 잰다.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(name, durations, items, peak, **extra)
+
+
+def run_once(name: str, func, items: int = 1, **extra) -> tuple[dict, object]:
+    started = time.perf_counter()
+    result = func()
+    return summarize(name, [time.perf_counter() - started], items, **extra), result
+
+
+def bench_price_functions(fake: FakeProviders, ranges: list[str], repeat: int) -> list[dict]:
+    results = []
+    end = datetime.now()
+    for label in ranges:
+        raw = fake.history("BENCH", end - timedelta(days=RANGE_DAYS[label]), end)
+        raw.index.name = "Date"
+        prices = app.normalize_price_frame(raw)
+        bars = len(prices)
+        results += [
+            measure(f"normalize_price_frame[{label}]", lambda: app.normalize_price_frame(raw), repeat, bars=bars),
+            measure(f"resample_weekly[{label}]", lambda: app.resample_weekly(prices), repeat, bars=bars),
+            measure(
+                f"make_price_volume_chart[{label}]",
+                lambda: app.make_price_volume_chart(prices, "bench", pivot_price=float(prices.high[-30])),
+                repeat,
+                bars=bars,
+            ),
+            measure(f"make_line_chart[{label}]", lambda: app.make_line_chart(prices, "bench"), repeat, bars=bars),
+        ]
+    return results
+
+
+def decode_chart_payload(payload: str) -> dict:
+    # 브라우저가 하는 JSON.parse와 base64 typed array 복원을 파이썬에서 같은 순서로 흉내 낸다.
+    def restore(value: dict):
+        if "bdata" in value and "dtype" in value:
+            return np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        return value
+
+    return json.loads(payload, object_hook=restore)
+
+
+def bench_chart_payloads(fake: FakeProviders, ranges: list[str], repeat: int) -> list[dict]:
+    results = []
+    end = datetime.now()
+    for label in ranges:
+        raw = fake.history("BENCH", end - timedelta(days=RANGE_DAYS[label]), end)
+        raw.index.name = "Date"
+        prices = app.normalize_price_frame(raw)
+        for case, (kind, options) in CHART_PAYLOAD_CASES.items():
+            builder = app.make_price_volume_chart if kind == "price_volume" else app.make_line_chart
+            if kind == "price_volume":
+                options = {**options, "pivot_price": float(prices.high[-30])}
+            for compact in (False, True):
+                mode = "compact" if compact else "legacy"
+                fig = builder(prices, "bench", compact=compact, **options)
+                payload = pio.to_json(fig, validate=False)
+                extra = {"bars": len(prices), "payload_kb": len(payload.encode()) / 1024}
+                results += [
+                    measure(
+                        f"chart_payload[{case},{label},{mode}] serialize",
+                        lambda: pio.to_json(fig, validate=False),
+                        repeat,
+                        **extra,
+                    ),
+                    measure(
+                        f"chart_payload[{case},{label},{mode}] parse",
+                        lambda: decode_chart_payload(payload),
+                        repeat,
+                        **extra,
+                    ),
+                ]
+    return results
+
+
+def format_payloads(results: list[dict]) -> str:
+    rows = {row["name"].rsplit(" ", 1)[0]: row["payload_kb"] for row in results if "payload_kb" in row}
+    lines = [f"{'chart payload':<48}{'KB':>10}{f'x{CHART_GRID_SIZE} KB':>12}{'vs legacy':>11}"]
+    for name, size in rows.items():
+        legacy = rows.get(name.replace(",compact]", ",legacy]"), size)
+        lines.append(f"{name:<48}{size:>10.1f}{size * CHART_GRID_SIZE:>12.0f}{legacy / size:>10.1f}x")
+    return "\n".join(lines)
+
+
+def bench_inputs(ticker_counts: list[int], repeat: int) -> list[dict]:
+    results = []
+    krx_index = app.build_krx_index(fake_listing())
+    listing = fake_listing()
+    for count in ticker_counts:
+        rows = listing.sample(count, replace=count > len(listing), random_state=count)
+        tokens = [name if index % 3 else code for index, (code, name) in enumerate(zip(rows["Code"], rows["Name"]))]
+        text = "\n".join(tokens + ["AAPL", "MSFT"])
+        results.append(
+            measure(
+                f"parse_bulk_input[{count}]",
+                lambda: app.parse_bulk_input(text, krx_index, max_items=count + 2),
+                repeat,
+                items=count,
+            )
+        )
+
+        upload = FakeUpload(fake_vcp_csv(count))
+        st.cache_resource.clear()
+        row, (content_hash, frame) = run_once(f"read_uploaded_csv[{count}] cold", lambda: app.read_uploaded_csv(upload))
+        results.append(row)
+        results.append(measure(f"read_uploaded_csv[{count}] warm", lambda: app.read_uploaded_csv(upload), repeat))
+
+        # filter_vcp_phase_2는 VcpScreener로 바뀌었으므로 인덱스 생성과 조회를 나눠 잰다.
+        results.append(
+            measure(f"VcpScreener.build[{count}]", lambda: app.VcpScreener.build(frame), repeat, items=count)
+        )
+        screener = app.VcpScreener.build(frame)
+        phases = screener.phase_options("2.")
+        results.append(
+            measure(
+                f"VcpScreener.query[{count}]",
+                lambda: screener.query(phases, {"stockeasy_rs": (50.0, None)}, limit=12),
+                repeat,
+                items=count,
+            )
+        )
+    return results
+
+
+def bench_data_layer(fake: FakeProviders, ticker_counts: list[int], ranges: list[str]) -> list[dict]:
+    results = []
+    end = datetime.now()
+    for count in ticker_counts:
+        tickers = fake_listing()["Code"].head(count).tolist()
+        fake.warm(tickers)
+        for label in ranges:
+            start = end - timedelta(days=RANGE_DAYS[label])
+            clear_caches(BENCH_DIR / f"ohlcv-data-{count}-{label}")
+            calls_before = sum(fake.calls.values())
+            for state in ("cold", "warm"):
+                row, histories = run_once(
+                    f"prefetch_stock_histories[{count}x{label}] {state}",
+                    lambda: app.prefetch_stock_histories(tickers, start, end, timeout=None),
+                    items=count,
+                )
+                row["loaded"] = sum(not prices.empty for prices in histories.values())
+                row["provider_calls"] = sum(fake.calls.values()) - calls_before
+                row["rss_mb"] = peak_rss_mb()
+                results.append(row)
+    return results
+
+
+def bench_page(fake: FakeProviders, ticker_counts: list[int], ranges: list[str]) -> list[dict]:
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    original_uploader = st.file_uploader
+    try:
+        for count in ticker_counts:
+            upload = FakeUpload(fake_vcp_csv(count))
+            fake.warm(pd.read_csv(BytesIO(upload.raw), dtype=str)["ticker"])
+            fake.warm(item["symbol"] for item in app.MARKET_TICKERS)
+            # AppTest는 파일 업로드를 흉내 낼 수 없어 업로더가 준비된 CSV를 돌려주게 바꾼다.
+            st.file_uploader = lambda *args, **kwargs: upload
+            for label in ranges:
+                clear_caches(BENCH_DIR / f"ohlcv-page-{count}-{label}")
+                page = AppTest.from_file(str(APP_PATH), default_timeout=600)
+                page.session_state["start_date"] = date.today() - timedelta(days=RANGE_DAYS[label])
+                page.session_state["end_date"] = date.today()
+                for state in ("cold", "warm"):
+                    row, _ = run_once(f"page[{count}x{label}] {state}", page.run)
+                    row["exceptions"] = len(page.exception)
+                    row["charts"] = len(page.get("plotly_chart"))
+                    row["rss_mb"] = peak_rss_mb()
+                    results.append(row)
+    finally:
+        st.file_uploader = original_uploader
+    return results
+
+
+def format_table(results: list[dict]) -> str:
+    lines = [f"{'benchmark':<48}{'calls':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'ops/s':>11}{'peak MB':>9}"]
+    for row in results:
+        peak = row.get("peak_mb") if row.get("peak_mb") is not None else row.get("rss_mb")
+        lines.append(
+            f"{row['name']:<48}{row['calls']:>6}{row['p50_ms']:>11.2f}{row['p95_ms']:>11.2f}{row['p99_ms']:>11.2f}"
+            f"{row['throughput_per_s']:>11.1f}{peak if peak is not None else float('nan'):>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="가짜 FDR/yfinance로 대시보드 성능을 오프라인에서 잰다.")
+    parser.add_argument("--latency", type=float, default=0.02, help="가짜 공급자 호출마다 기다릴 초")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="가짜 공급자 호출이 실패할 확률")
+    parser.add_argument("--tickers", default=DEFAULT_TICKER_COUNTS, help="쉼표로 구분한 종목 수")
+    parser.add_argument("--ranges", default=",".join(RANGE_DAYS), help="쉼표로 구분한 기간 (1y,5y,20y)")
+    parser.add_argument("--repeat", type=int, default=20, help="함수 단위 벤치마크 반복 횟수")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="공급자 요청 속도 제한을 그대로 둔다")
+    parser.add_argument("--skip-page", action="store_true", help="AppTest 전체 렌더링을 건너뛴다")
+    parser.add_argument("--json", type=Path, help="결과를 JSON으로 저장할 경로")
+    parser.add_argument("--keep", action="store_true", help="끝난 뒤 임시 캐시·가격 저장소 폴더를 지우지 않는다")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    ticker_counts = [int(value) for value in args.tickers.split(",") if value]
+    ranges = [value for value in args.ranges.split(",") if value]
+    unknown = sorted(set(ranges) - set(RANGE_DAYS))
+    if unknown:
+        raise SystemExit(f"알 수 없는 기간: {', '.join(unknown)}")
+
+    if args.keep:
+        atexit.unregister(shutil.rmtree)
+        print(f"임시 저장소를 남깁니다: {BENCH_DIR}")
+
+    fake = FakeProviders(args.latency, args.failure_rate)
+    fake.install()
+    if not args.keep_rate_limits:
+        # 가짜 공급자라 속도 제한은 대기 시간만 늘린다.
+        app.PROVIDER_RATE_LIMITS = {provider: (1e9, 10**9) for provider in app.PROVIDER_RATE_LIMITS}
+
+    results = bench_price_functions(fake, ranges, args.repeat)
+    results += bench_chart_payloads(fake, ranges, args.repeat)
+    results += bench_inputs(ticker_counts, args.repeat)
+    results += bench_data_layer(fake, ticker_counts, ranges)
+    if not args.skip_page:
+        results += bench_page(fake, ticker_counts, ranges)
+
+    print(format_table(results))
+    print()
+    print(format_payloads(results))
+    print(f"\nprovider calls: {fake.calls}, peak RSS: {peak_rss_mb():.1f} MB")
+    if args.json:
+        payload = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {key: str(value) for key, value in vars(args).items()},
+            "provider_calls": fake.calls,
+            "peak_rss_mb": peak_rss_mb(),
+            "results": results,
+        }
+        args.json.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
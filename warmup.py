@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+
+# Streamlit 서버 없이 app 함수를 부를 때 나오는 실행 맥락 경고를 숨긴다.
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import app
+
+# 예열은 저장소를 실제로 새로 채우는 것이 목적이므로 오래된 데이터도 기다려서 다시 받는다.
+app.STALE_WHILE_REVALIDATE = False
+
+DEFAULT_VCP_LIMIT = 60
+WATCHLIST_MAX_ITEMS = 10_000
+
+
+def log(message: str) -> None:
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+def latest_csv(path: Path) -> Path | None:
+    if path.is_file():
+        return path
+    candidates = sorted(path.glob("*.csv"), key=lambda item: item.stat().st_mtime)
+    return candidates[-1] if candidates else None
+
+
+def watchlist_tickers(paths: list[Path], krx_index: app.KrxSymbolIndex) -> list[str]:
+    tickers = []
+    for path in paths:
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError as exc:
+            log(f"관심 종목 파일을 읽지 못했습니다: {path} ({exc})")
+            continue
+        targets, failed = app.parse_bulk_input(text, krx_index, max_items=WATCHLIST_MAX_ITEMS)
+        tickers += [ticker for ticker, _ in targets]
+        if failed:
+            log(f"{path.name}: 인식하지 못한 항목 {len(failed)}개 ({', '.join(failed[:5])})")
+    return tickers
+
+
+def vcp_tickers(path: Path | None, limit: int) -> list[str]:
+    csv_path = latest_csv(path) if path is not None else None
+    if csv_path is None:
+        if path is not None:
+            log(f"VCP CSV를 찾지 못했습니다: {path}")
+        return []
+
+    # 업로드 파일과 같은 경로로 읽도록 getvalue()가 있는 BytesIO로 넘긴다.
+    _, frame = app.read_uploaded_csv(BytesIO(csv_path.read_bytes()))
+    missing = sorted(app.REQUIRED_VCP_COLUMNS - set(frame.columns))
+    if missing:
+        log(f"{csv_path.name}: 필요한 컬럼이 없습니다 ({', '.join(missing)})")
+        return []
+
+    screener = app.VcpScreener.build(frame)
+    candidates = screener.query(screener.phase_options("2."), limit=limit)
+    log(f"{csv_path.name}: VCP 2번대 후보 {len(candidates)}개")
+    return candidates["ticker"].tolist()
+
+
+def refresh_krx_index() -> app.KrxSymbolIndex:
+    # 디스크 목록이 아직 유효해도 예열 때는 새로 받아 둔다.
+    app.download_krx_listing()
+    app.get_krx_index.clear()
+    return app.get_krx_index()
+
+
+def warm_once(args: argparse.Namespace) -> bool:
+    started = time.perf_counter()
+    start, end = app.page_datetime_range(date.today() - timedelta(days=args.days), date.today())
+
+    jobs = {"market": app.fetch_market_histories(start, end), "krx": app.run_blocking(refresh_krx_index)}
+    results = app.run_data_tasks(app.gather_with_progress(jobs, args.timeout), args.workers)
+    market = results.get("market", {})
+    krx_index = results.get("krx", app.KrxSymbolIndex())
+    market_loaded = sum(not prices.empty for prices in market.values())
+    log(
+        f"주요 지표 {market_loaded}/{len(app.MARKET_TICKERS)}개, "
+        f"KRX 종목 {len(krx_index.code_to_item)}개"
+    )
+
+    tickers = list(
+        dict.fromkeys(
+            watchlist_tickers(args.watchlist, krx_index)
+            + vcp_tickers(args.vcp, args.vcp_limit)
+            + [ticker for value in args.tickers for ticker in value.split(",") if ticker.strip()]
+        )
+    )
+    histories = app.prefetch_stock_histories(tickers, start, end, max_workers=args.workers, timeout=args.timeout)
+    loaded = sum(not prices.empty for prices in histories.values())
+    log(f"종목 {loaded}/{len(tickers)}개 저장 완료 ({time.perf_counter() - started:.1f}초)")
+
+    if args.krx_all:
+        result = app.scan_krx_vcp(date.today(), timeout=args.timeout)
+        log(f"KRX 전 종목 VCP 계산 {len(result)}개, 2번대 {result['vcp_phase'].str.startswith('2.').sum()}개")
+        if args.scan_output is not None:
+            result.to_csv(args.scan_output, index=False, encoding="utf-8-sig")
+
+    app.export_metrics(force=True)
+    # 개별 종목 실패는 상장폐지 등일 수 있어 로그로만 남기고, 목록이나 지표를 못 받았을 때만 실패로 본다.
+    return bool(krx_index.code_to_item) and market_loaded == len(app.MARKET_TICKERS)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="대시보드가 쓰는 KRX 종목 목록, 주요 지표, 관심 종목/VCP 후보 가격을 미리 받아 저장소를 채운다."
+    )
+    parser.add_argument(
+        "--watchlist",
+        type=Path,
+        action="append",
+        default=[],
+        help="종목명·코드·티커를 줄바꿈이나 쉼표로 적은 텍스트 파일 (여러 번 지정 가능)",
+    )
+    parser.add_argument("--vcp", type=Path, help="VCP CSV 파일 또는 가장 최근 CSV를 고를 폴더")
+    parser.add_argument("--vcp-limit", type=int, default=DEFAULT_VCP_LIMIT, help="미리 받을 VCP 후보 수")
+    parser.add_argument("--tickers", action="append", default=[], help="쉼표로 구분한 추가 종목")
+    parser.add_argument(
+        "--krx-all", action="store_true", help="KRX 전 종목 가격을 VCP 계산 기간만큼 받아 두고 VCP 단계를 계산한다"
+    )
+    parser.add_argument("--scan-output", type=Path, help="--krx-all 계산 결과를 저장할 CSV 경로")
+    parser.add_argument("--days", type=int, default=app.DEFAULT_HISTORY_DAYS, help="받을 기간 (일)")
+    parser.add_argument("--workers", type=int, default=app.PREFETCH_MAX_WORKERS, help="동시에 실행할 요청 수")
+    parser.add_argument(
+        "--timeout", type=float, default=app.VCP_SCAN_TIMEOUT_SECONDS, help="한 단계에서 기다릴 최대 초"
+    )
+    parser.add_argument("--every", type=float, default=0, help="이 분마다 반복한다. 0이면 한 번만 실행한다")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    log(f"저장소: {app.PRICE_STORE_DIR}")
+    while True:
+        round_started = time.monotonic()
+        try:
+            ok = warm_once(args)
+        except Exception as exc:
+            log(f"예열 실패: {exc!r}")
+            ok = False
+        if args.every <= 0:
+            return 0 if ok else 1
+        # 한 번 도는 시간이 길어도 시작 시각 기준으로 간격을 맞춘다.
+        time.sleep(max(0.0, args.every * 60 - (time.monotonic() - round_started)))
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)